@@ -1,28 +1,44 @@
-import librosa
 import numpy as np
-from raga_data import ALL_SWARAS
-from config import DEFAULT_TONIC
+from config import DEFAULT_TONIC, PITCH_TRACKER, NOTE_SEGMENTATION_THRESHOLD, MIN_NOTE_DURATION_FRAMES, CONTOUR_POINTS
+from audio_io import load_audio
+from pitch_trackers import track_pitch, HOP_LENGTH
+from live_pitch import deviation_colors
+from raga_index import PITCH_CLASS_NAMES, SWARA_PITCH_CLASS
+from swara_lookup import ALL_SWARAS_LOOKUP, swara_breakdown
+from metrics import AUDIO_SECONDS, observe, stage_timer
+from note_quality import note_quality
+from decimation import minmax_indices
 
-def normalize_cents(cents: float) -> float:
-    """Normalize cents to 0-1200 range"""
+# Pitch class of each entry in ALL_SWARAS_LOOKUP.names
+LOOKUP_PITCH_CLASS = np.array([SWARA_PITCH_CLASS[name] for name in ALL_SWARAS_LOOKUP.names])
+
+def normalize_cents(cents):
+    """Normalize cents (scalar or array) to 0-1200 range"""
     return cents % 1200
 
-def analyze_pitch_detailed(audio_path: str, tonic: float = DEFAULT_TONIC):
+def analyze_pitch_detailed(audio, tonic: float = DEFAULT_TONIC, tracker: str = PITCH_TRACKER, raga: str = None):
     """
     Analyze pitch with tonic (Sa) as the target reference
     User selects their shruti, that becomes Sa, and we measure deviation from it
+    `audio` is the uploaded bytes or a file path, `tracker` a key of PITCH_TRACKERS,
+    `raga` limits the swara-by-swara breakdown to that raga's swaras
     """
     # Load and extract pitch
-    y, sr = librosa.load(audio_path, sr=16000, duration=None)  # None = full audio
-    f0, voiced_flag, voiced_probs = librosa.pyin(
-        y, 
-        fmin=librosa.note_to_hz('C2'), 
-        fmax=librosa.note_to_hz('C7'),
-        frame_length=1024,  # Smaller frame = faster (was 2048)
-        hop_length=256,     # Larger hop = fewer frames to process
-        fill_na=None        # Don't interpolate missing values
-    )
-    
+    y, sr, f0, voiced_flag, voiced_probs = _load_and_track(audio, tracker)
+    with stage_timer("postprocess"):
+        return summarize_pitch(f0, voiced_flag, voiced_probs, sr, tonic, tracker, raga)
+
+def _load_and_track(audio, tracker: str):
+    """Decode + pitch-track with per-stage timings, returns (y, sr, f0, voiced_flag, voiced_probs)"""
+    with stage_timer("decode"):
+        y, sr = load_audio(audio)
+    observe(AUDIO_SECONDS.name, len(y) / sr)
+    with stage_timer("pitch_tracking"):
+        f0, voiced_flag, voiced_probs = track_pitch(y, sr, tracker)
+    return y, sr, f0, voiced_flag, voiced_probs
+
+def summarize_pitch(f0, voiced_flag, voiced_probs, sr, tonic: float, tracker: str, raga: str = None):
+    """Post-processing stage: turn per-frame pitch tracker output into the graph + scores"""
     # Filter valid pitches
     valid_mask = voiced_flag & (voiced_probs > 0.6)  # Higher threshold = fewer points
     valid_pitches = f0[valid_mask]
@@ -32,69 +48,125 @@ def analyze_pitch_detailed(audio_path: str, tonic: float = DEFAULT_TONIC):
     
     # Convert ALL pitch values to cents (for graphing)
     cents_array = 1200 * np.log2(valid_pitches / tonic)
+    frame_indices = np.nonzero(valid_mask)[0]
     
-    # Create time points for x-axis
-    max_points = 300
-    if len(cents_array) > max_points:
-        indices = np.linspace(0, len(cents_array) - 1, max_points, dtype=int)
-        cents_array = cents_array[indices]
-        valid_mask_indices = np.where(valid_mask)[0][indices]
-    else:
-        valid_mask_indices = np.where(valid_mask)[0]
-    
-    hop_length = 256
-    time_points = librosa.frames_to_time(valid_mask_indices, sr=sr, hop_length=hop_length)
-    
-    # Calculate average pitch
+    # Stats over the full-resolution contour, before any downsampling
     avg_cents = np.median(cents_array)
     norm_cents = normalize_cents(avg_cents)
+    stability = np.std(cents_array)
     
     # Identify the closest Swara
-    closest_swara = min(ALL_SWARAS.keys(), 
-                        key=lambda s: min(abs(norm_cents - ALL_SWARAS[s]), 
-                                        1200 - abs(norm_cents - ALL_SWARAS[s])))
+    closest_swara = ALL_SWARAS_LOOKUP.names[ALL_SWARAS_LOOKUP.label(norm_cents)[0]]
+    breakdown = swara_breakdown(cents_array, raga)
+    quality = note_quality(cents_array, frame_indices, HOP_LENGTH / sr)
     target_cents = 0  # Sa is always 0 cents from tonic
     target_swara = "Sa"
     
     # Calculate deviation
     deviation = ((norm_cents - target_cents + 600) % 1200) - 600
-    stability = np.std(cents_array)
     
-    # Normalize cents_array to be relative to target (for better visualization)
-    normalized_pitch_contour = []
-    for cent_val in cents_array:
-        normalized_val = (cent_val % 1200)  # Keep in 0-1200 range for swara mapping
-        # Handle wrap-around (e.g., if target is 1088 and pitch is 50)
-        normalized_pitch_contour.append(normalized_val)
-    
-    # Create target line (flat line at 0 deviation)
-    target_line = [0] * len(time_points)
-    
-    # Color code deviations (for frontend visualization)
-    deviation_colors = []
-    for cent_val in cents_array:
-        norm_val = (cent_val % 1200)
-        dist_from_sa = min(abs(norm_val), abs(norm_val - 1200))
-        
-        if dist_from_sa < 10:
-            deviation_colors.append("green")
-        elif dist_from_sa < 25:
-            deviation_colors.append("yellow")
-        else:
-            deviation_colors.append("red")
+    # Every voiced frame, kept for the paginated contour endpoint and other point budgets
+    full_contour = {
+        "hop_seconds": HOP_LENGTH / sr,
+        "frame_indices": frame_indices.tolist(),
+        "cents": np.round(cents_array, 1).tolist()
+    }
     
     return {
         "swara": target_swara,  # Always Sa - this is what they're trying to sing
-        "actual_swara": closest_swara,  # What they actually sang
-        "deviation": round(deviation, 1),
-        "overall_stability": round(stability, 1),
-        "gauge_value": round(deviation, 1),
+        "actual_swara": str(closest_swara),  # What they actually sang
+        "deviation": round(float(deviation), 1),
+        "overall_stability": round(float(stability), 1),
+        "gauge_value": round(float(deviation), 1),
         "score": int(max(0, 100 - abs(deviation))),
         
-        # NEW: Data for live pitch graph
-        "pitch_contour": normalized_pitch_contour,  # Y-axis values (cents deviation)
-        "time_points": time_points.tolist(),  # X-axis values (seconds)
-        "target_line": target_line,  # Flat line at 0
+        # NEW: Data for live pitch graph (pitch_contour, time_points, target_line, deviation_colors)
+        **contour_view(full_contour, CONTOUR_POINTS),
         "target_cents": target_cents,  # The ideal pitch in cents
-        "deviation_colors": deviation_colors  # Color coding for visualization
+        "full_contour": full_contour,  # Stored with the analysis, stripped from responses
+        "swara_breakdown": breakdown,  # Per-swara score over every voiced frame
+        "tracker": tracker,
+        **quality  # Drift, vibrato, attack/release, phases, problem zones (full resolution)
     }
+
+def contour_view(full_contour: dict, max_points: int = CONTOUR_POINTS):
+    """
+    Graph data for at most `max_points` points of a full-resolution contour
+    Min/max-per-bucket decimation on the deviation from Sa, so brief slips off the
+    shruti stay visible however small the budget.
+    """
+    cents = np.asarray(full_contour["cents"], dtype=np.float64)
+    frame_indices = np.asarray(full_contour["frame_indices"])
+    indices = minmax_indices((cents + 600) % 1200 - 600, max_points)
+    cents = cents[indices]
+    time_points = frame_indices[indices] * full_contour["hop_seconds"]
+    return {
+        # Keep in 0-1200 range for swara mapping
+        "pitch_contour": np.round(normalize_cents(cents), 1).tolist(),  # Y-axis values (cents deviation)
+        "time_points": np.round(time_points, 4).tolist(),  # X-axis values (seconds)
+        "target_line": [0] * len(time_points),  # Flat line at 0
+        "deviation_colors": deviation_colors(cents).tolist()  # Color coding for visualization
+    }
+
+def client_result(result: dict, max_points: int = CONTOUR_POINTS):
+    """Analysis result as sent to the client: contour re-decimated to `max_points`, full contour dropped"""
+    response = {key: value for key, value in result.items() if key != "full_contour"}
+    if max_points != CONTOUR_POINTS and "full_contour" in result:
+        response.update(contour_view(result["full_contour"], max_points))
+    return response
+
+def warm_up_pipeline():
+    """
+    Push a short synthetic note through decode + every tracker + post-processing
+    Loads librosa and fills numba's JIT cache now instead of on the first real request.
+    """
+    import io
+    import soundfile as sf
+    from synthetic_voice import synth_voice
+    from pitch_trackers import PITCH_TRACKERS
+    
+    y, sr, _ = synth_voice(duration=0.5, sr=44100)
+    buffer = io.BytesIO()
+    sf.write(buffer, y, sr, format="WAV")
+    for tracker in PITCH_TRACKERS:
+        analyze_pitch_detailed(buffer.getvalue(), tracker=tracker)
+
+def segment_swaras(cents, hop_seconds: float):
+    """
+    Split a per-frame cents contour (NaN = unvoiced) into held swaras
+    Frames further than NOTE_SEGMENTATION_THRESHOLD from every swara are treated as
+    transitions; runs shorter than MIN_NOTE_DURATION_FRAMES are dropped and repeated
+    neighbours merged. Returns [{"swara", "pitch_class", "start", "duration"}].
+    """
+    swara_index, offset = ALL_SWARAS_LOOKUP.label(np.nan_to_num(cents, nan=0.0))
+    labels = LOOKUP_PITCH_CLASS[swara_index]
+    labels[np.isnan(cents) | (np.abs(offset) > NOTE_SEGMENTATION_THRESHOLD)] = -1
+    
+    if len(labels) == 0:
+        return []
+    
+    # Run-length encode the frame labels
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(labels)) + 1])
+    lengths = np.diff(np.concatenate([starts, [len(labels)]]))
+    run_labels = labels[starts]
+    keep = (run_labels >= 0) & (lengths >= MIN_NOTE_DURATION_FRAMES)
+    
+    notes = []
+    for start, length, pc in zip(starts[keep], lengths[keep], run_labels[keep]):
+        if notes and notes[-1]["pitch_class"] == pc:
+            notes[-1]["duration"] = round((start + length) * hop_seconds - notes[-1]["start"], 3)
+            continue
+        notes.append({
+            "swara": PITCH_CLASS_NAMES[int(pc)],
+            "pitch_class": int(pc),
+            "start": round(start * hop_seconds, 3),
+            "duration": round(length * hop_seconds, 3)
+        })
+    return notes
+
+def analyze_swara_sequence(audio, tonic: float = DEFAULT_TONIC, tracker: str = PITCH_TRACKER):
+    """Pitch-track a phrase and segment it into the sequence of swaras sung"""
+    y, sr, f0, voiced_flag, voiced_probs = _load_and_track(audio, tracker)
+    with stage_timer("segmentation"):
+        cents = np.where(voiced_flag & (voiced_probs > 0.6), 1200 * np.log2(f0 / tonic), np.nan)
+        return segment_swaras(cents, HOP_LENGTH / sr)
@@ -1,58 +1,71 @@
-import anthropic
-from config import ANTHROPIC_API_KEY
+import asyncio
 
-claude_client = None
-if ANTHROPIC_API_KEY and ANTHROPIC_API_KEY != "your-api-key-here":
-    claude_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+from config import ANTHROPIC_API_KEY, FEEDBACK_TIMEOUT
+from feedback_cache import feedback_signature, get_cached_feedback, store_feedback_variant
+from database import run_db
+from metrics import FEEDBACK_TOTAL, stage_timer
 
-def generate_shruti_feedback(swara, deviation, stability, detailed_analysis=None):
+CLAUDE_MODEL = "claude-sonnet-4-20250514"  # Use Sonnet 4 (latest)
+
+_clients = {}  # "sync" / "async" -> Anthropic client, created on first use
+
+# Feedback sources that may be cached with an analysis. Timeout / error fallbacks
+# aren't, so a resubmit of the same recording gets another chance at Claude.
+CACHEABLE_SOURCES = ("claude", "cache", "rule_based")
+
+def _get_client(kind: str = "sync"):
+    """Claude client, or None when no API key is configured (imports anthropic on first call)"""
+    if not ANTHROPIC_API_KEY or ANTHROPIC_API_KEY == "your-api-key-here":
+        return None
+    if kind not in _clients:
+        import anthropic
+        client_class = anthropic.AsyncAnthropic if kind == "async" else anthropic.Anthropic
+        _clients[kind] = client_class(api_key=ANTHROPIC_API_KEY, timeout=FEEDBACK_TIMEOUT)
+    return _clients[kind]
+
+def cacheable_feedback(feedback, source):
+    """`feedback` if it can go in the analysis cache, else None (regenerated next time)"""
+    return feedback if source in CACHEABLE_SOURCES else None
+
+def _simple_feedback(swara, display_dev):
+    """Short rule-based feedback used when no Claude client is configured"""
+    if display_dev < 10:
+        return f"Excellent! Your {swara} is perfectly in tune with the shruti. Keep up the great work!"
+    elif display_dev < 25:
+        return f"Good attempt! Your {swara} is close but slightly off the shruti. Listen more carefully to the tanpura."
+    else:
+        return f"Your {swara} went off shruti. Focus on matching the tanpura drone exactly and practice slowly."
+
+def _contour_insights(stability, detailed_analysis):
     """
-    Generate detailed AI feedback like a live Carnatic music teacher
-    Natural language, no technical jargon like "cents"
+    Describe the pitch contour in teacher's words
+    Uses the full-resolution note-quality fields from the analysis (see note_quality)
+    Returns (contour_insights, drift_info, wobble_info, timing_info)
     """
-    display_dev = min(abs(deviation), 100)
-    
-    if not claude_client:
-        if display_dev < 10:
-            return f"Excellent! Your {swara} is perfectly in tune with the shruti. Keep up the great work!"
-        elif display_dev < 25:
-            return f"Good attempt! Your {swara} is close but slightly off the shruti. Listen more carefully to the tanpura."
-        else:
-            return f"Your {swara} went off shruti. Focus on matching the tanpura drone exactly and practice slowly."
-    # Analyze pitch contour if available
     contour_insights = []
     drift_info = ""
     wobble_info = ""
     timing_info = ""
-    if detailed_analysis and "pitch_contour" in detailed_analysis:
-        pitch_contour = detailed_analysis["pitch_contour"]
-        time_points = detailed_analysis.get("time_points", [])
-        
+    if detailed_analysis and "phases" in detailed_analysis:
         # Check for drift (is pitch going up or down over time?)
-        if len(pitch_contour) > 10:
-            start_avg = sum(pitch_contour[:5]) / 5
-            end_avg = sum(pitch_contour[-5:]) / 5
-            drift = end_avg - start_avg
-            
-            if abs(drift) > 20:
-                direction = "higher" if drift > 0 else "lower"
-                when = "towards the end" if drift > 0 else "as you held the note"
-                drift_info = f"Your pitch drifted {direction} {when}"
-                contour_insights.append(drift_info)
-            if len(pitch_contour) > 20:
-                mid_section = pitch_contour[len(pitch_contour)//3:2*len(pitch_contour)//3]
-                wobble_range = max(mid_section) - min(mid_section)
-                if wobble_range > 50:
-                    wobble_info = "Your voice was shaking quite a bit in the middle"
-                    contour_insights.append(wobble_info)
-                elif wobble_range > 30:
-                    wobble_info = "There's some wavering when you hold the note"
-                    contour_insights.append(wobble_info)
-            if len(time_points) > 5:
-                duration = time_points[-1] - time_points[0]
-                if duration < 1.5:
-                    timing_info = "You released the note too quickly"
-                    contour_insights.append(timing_info)
+        if detailed_analysis["is_drifting"]:
+            rising = detailed_analysis["drift_rate"] > 0
+            direction = "higher" if rising else "lower"
+            when = "towards the end" if rising else "as you held the note"
+            drift_info = f"Your pitch drifted {direction} {when}"
+            contour_insights.append(drift_info)
+        
+        wobble_range = detailed_analysis["phases"]["sustain"]["wobble_range"]
+        if wobble_range > 50:
+            wobble_info = "Your voice was shaking quite a bit in the middle"
+            contour_insights.append(wobble_info)
+        elif wobble_range > 30:
+            wobble_info = "There's some wavering when you hold the note"
+            contour_insights.append(wobble_info)
+        
+        if detailed_analysis["note_duration"] < 1.5:
+            timing_info = "You released the note too quickly"
+            contour_insights.append(timing_info)
         
         # Check stability - how much wobble?
         if stability > 40:
@@ -62,19 +75,22 @@ def generate_shruti_feedback(swara, deviation, stability, detailed_analysis=None
         elif stability < 8:
             contour_insights.append("Your pitch is rock steady")
     
-    # Determine teaching approach
+    return contour_insights, drift_info, wobble_info, timing_info
+
+def _teaching_level(display_dev):
+    """Determine teaching approach: (accuracy, skill_level) bucket for the deviation"""
     if display_dev < 10:
-        accuracy = "perfectly on shruti"
-        skill_level = "excellent"
+        return "perfectly on shruti", "excellent"
     elif display_dev < 20:
-        accuracy = "close to shruti but slightly off"
-        skill_level = "good"
+        return "close to shruti but slightly off", "good"
     elif display_dev < 35:
-        accuracy = "noticeably off shruti"
-        skill_level = "needs practice"
+        return "noticeably off shruti", "needs practice"
     else:
-        accuracy = "quite far from shruti"
-        skill_level = "beginner"
+        return "quite far from shruti", "beginner"
+
+def _build_prompt(swara, display_dev, contour_insights):
+    """Build the Claude prompt for one sung swara"""
+    accuracy, skill_level = _teaching_level(display_dev)
     
     prompt = f"""You are an experienced Carnatic music guru teaching a student in person. The student just sang {swara}.
 
@@ -121,43 +137,120 @@ You speak naturally like a real music teacher - warm, encouraging, but honest. Y
 - Give ACTIONABLE practice advice with details
 - 5-7 sentences total (more detailed than before)
 - Keep it natural and conversational but thorough"""
+    return prompt
+
+def _fallback_feedback(swara, display_dev, stability, contour_insights, drift_info, wobble_info, timing_info):
+    """Detailed rule-based feedback used when the Claude call fails or misses its deadline"""
+    if display_dev < 15:
+        feedback = f"Beautiful {swara}! Your pitch was right on the shruti. "
+        if stability < 10:
+            feedback += "You started strong and held it perfectly steady throughout - your voice didn't waver even a bit. That shows excellent breath control and pitch awareness. "
+        elif drift_info:
+            feedback += f"You came in perfectly, but {drift_info.lower()}. Next time, imagine the shruti as a fixed point and keep your voice locked onto it from beginning to end. "
+        else:
+            feedback += "Your pitch was clean and confident from start to finish. "
+        feedback += "Keep practicing like this!"
+    elif display_dev < 30:
+        feedback = f"Your {swara} was in the right area but went off the shruti. "
+        if drift_info:
+            feedback += f"I noticed that {drift_info.lower()}. This usually happens when you lose focus on the tanpura - try to keep listening to it throughout the note. "
+        elif wobble_info:
+            feedback += f"{wobble_info}. This often means uneven breath support. "
+        else:
+            feedback += "You started close but your pitch wandered away from the target. "
+        if timing_info:
+            feedback += f"{timing_info}. "
+        feedback += "Practice holding the note for at least 3-4 seconds while keeping your voice steady and matching the tanpura exactly."
+    else:
+        feedback = f"Your {swara} didn't land on the shruti - I could hear it was quite far off. "
+        if contour_insights:
+            feedback += f"{contour_insights[0]}. "
+        else:
+            feedback += "The pitch wasn't stable and it didn't match the tanpura. "
+        if drift_info:
+            feedback += f"Additionally, {drift_info.lower()}. "
+        feedback += "Let's break this down: First, listen carefully to the tanpura and hum the Sa until you can match it perfectly. Then, practice singing that same pitch with an open voice. Start very slowly - accuracy is more important than anything else right now."
+    
+    return feedback
+
+def generate_shruti_feedback(swara, deviation, stability, detailed_analysis=None):
+    """
+    Generate detailed AI feedback like a live Carnatic music teacher
+    Natural language, no technical jargon like "cents"
+    Returns (feedback, source), source being claude / cache / rule_based / fallback
+    """
+    display_dev = min(abs(deviation), 100)
+    claude_client = _get_client()
+    
+    if not claude_client:
+        FEEDBACK_TOTAL.inc(source="rule_based")
+        return _simple_feedback(swara, display_dev), "rule_based"
+    
+    insights = _contour_insights(stability, detailed_analysis)
+    # The prompt only depends on this signature, so reuse earlier answers for it
+    signature = feedback_signature(swara, _teaching_level(display_dev)[1], insights[0])
+    cached = get_cached_feedback(signature)
+    if cached:
+        FEEDBACK_TOTAL.inc(source="cache")
+        return cached, "cache"
+    
+    prompt = _build_prompt(swara, display_dev, insights[0])
     try:
-        message = claude_client.messages.create(
-            model="claude-sonnet-4-20250514",  # Use Sonnet 4 (latest)",
-            max_tokens=400,  # Increased for more detailed feedback
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return message.content[0].text
+        with stage_timer("llm_call"):
+            message = claude_client.messages.create(
+                model=CLAUDE_MODEL,
+                max_tokens=400,  # Increased for more detailed feedback
+                messages=[{"role": "user", "content": prompt}]
+            )
+        feedback = message.content[0].text
+        store_feedback_variant(signature, feedback)
+        FEEDBACK_TOTAL.inc(source="claude")
+        return feedback, "claude"
     except Exception as e:
         print(f"AI feedback error: {e}")
-        if display_dev < 15:
-            feedback = f"Beautiful {swara}! Your pitch was right on the shruti. "
-            if stability < 10:
-                feedback += "You started strong and held it perfectly steady throughout - your voice didn't waver even a bit. That shows excellent breath control and pitch awareness. "
-            elif drift_info:
-                feedback += f"You came in perfectly, but {drift_info.lower()}. Next time, imagine the shruti as a fixed point and keep your voice locked onto it from beginning to end. "
-            else:
-                feedback += "Your pitch was clean and confident from start to finish. "
-            feedback += "Keep practicing like this!"
-        elif display_dev < 30:
-            feedback = f"Your {swara} was in the right area but went off the shruti. "
-            if drift_info:
-                feedback += f"I noticed that {drift_info.lower()}. This usually happens when you lose focus on the tanpura - try to keep listening to it throughout the note. "
-            elif wobble_info:
-                feedback += f"{wobble_info}. This often means uneven breath support. "
-            else:
-                feedback += "You started close but your pitch wandered away from the target. "
-            if timing_info:
-                feedback += f"{timing_info}. "
-            feedback += "Practice holding the note for at least 3-4 seconds while keeping your voice steady and matching the tanpura exactly."
-        else:
-            feedback = f"Your {swara} didn't land on the shruti - I could hear it was quite far off. "
-            if contour_insights:
-                feedback += f"{contour_insights[0]}. "
-            else:
-                feedback += "The pitch wasn't stable and it didn't match the tanpura. "
-            if drift_info:
-                feedback += f"Additionally, {drift_info.lower()}. "
-            feedback += "Let's break this down: First, listen carefully to the tanpura and hum the Sa until you can match it perfectly. Then, practice singing that same pitch with an open voice. Start very slowly - accuracy is more important than anything else right now."
-        
-        return feedback
+        FEEDBACK_TOTAL.inc(source="fallback")
+        return _fallback_feedback(swara, display_dev, stability, *insights), "fallback"
+
+async def generate_shruti_feedback_async(swara, deviation, stability, detailed_analysis=None, timeout=FEEDBACK_TIMEOUT):
+    """
+    Same as generate_shruti_feedback but awaits Claude without blocking the event loop
+    Falls back to the rule-based text if Claude hasn't answered within `timeout` seconds
+    Returns (feedback, source), source also being "timeout" for that fallback
+    """
+    display_dev = min(abs(deviation), 100)
+    async_claude_client = _get_client("async")
+    
+    if not async_claude_client:
+        FEEDBACK_TOTAL.inc(source="rule_based")
+        return _simple_feedback(swara, display_dev), "rule_based"
+    
+    insights = _contour_insights(stability, detailed_analysis)
+    signature = feedback_signature(swara, _teaching_level(display_dev)[1], insights[0])
+    cached = await run_db(get_cached_feedback, signature)
+    if cached:
+        FEEDBACK_TOTAL.inc(source="cache")
+        return cached, "cache"
+    
+    prompt = _build_prompt(swara, display_dev, insights[0])
+    try:
+        with stage_timer("llm_call"):
+            message = await asyncio.wait_for(
+                async_claude_client.messages.create(
+                    model=CLAUDE_MODEL,
+                    max_tokens=400,
+                    messages=[{"role": "user", "content": prompt}]
+                ),
+                timeout=timeout
+            )
+        feedback = message.content[0].text
+        await run_db(store_feedback_variant, signature, feedback)
+        FEEDBACK_TOTAL.inc(source="claude")
+        return feedback, "claude"
+    except asyncio.TimeoutError:
+        print(f"⏱️ AI feedback took longer than {timeout}s, using rule-based feedback")
+        source = "timeout"
+    except Exception as e:
+        print(f"AI feedback error: {e}")
+        source = "fallback"
+    FEEDBACK_TOTAL.inc(source=source)
+    return _fallback_feedback(swara, display_dev, stability, *insights), source
@@ -0,0 +1,58 @@
+import hashlib
+import json
+import time
+
+from database import get_connection
+from ttl_cache import LRUCache
+from config import (
+    ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_PERSIST,
+    ANALYSIS_CACHE_MAX_ROWS, ANALYSIS_CACHE_TTL
+)
+
+# Bump when analysis output changes so old entries stop matching
+ANALYSIS_VERSION = 7
+
+_memory = LRUCache(ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL)
+
+def analysis_cache_key(audio_bytes: bytes, tonic: float, tracker: str, raga: str = None) -> str:
+    """Content address for an analysis: audio hash + everything that changes the output"""
+    digest = hashlib.sha256(audio_bytes).hexdigest()
+    return f"{digest}:{round(tonic, 2)}:{tracker}:{raga or ''}:v{ANALYSIS_VERSION}"
+
+def get_cached_analysis(key: str):
+    """Look up a cached analysis, memory first, then SQLite"""
+    value = _memory.get(key)
+    if value is not None or not ANALYSIS_CACHE_PERSIST:
+        return value
+
+    conn = get_connection()
+    row = conn.execute(
+        'SELECT value, created_at FROM analysis_cache WHERE key = ? AND created_at > ?',
+        (key, time.time() - ANALYSIS_CACHE_TTL)
+    ).fetchone()
+    if row is None:
+        return None
+
+    value = json.loads(row[0])
+    _memory.put(key, value, stored_at=row[1])
+    return value
+
+def put_cached_analysis(key: str, value: dict):
+    """Store an analysis in both tiers, evicting expired and overflow rows"""
+    _memory.put(key, value)
+    if not ANALYSIS_CACHE_PERSIST:
+        return
+
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO analysis_cache (key, value, created_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value), now)
+        )
+        conn.execute('DELETE FROM analysis_cache WHERE created_at <= ?', (now - ANALYSIS_CACHE_TTL,))
+        conn.execute('''
+            DELETE FROM analysis_cache WHERE key IN (
+                SELECT key FROM analysis_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (ANALYSIS_CACHE_MAX_ROWS,))
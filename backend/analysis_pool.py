@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+from config import ANALYSIS_WORKERS, ANALYSIS_QUEUE_LIMIT, ANALYSIS_RETRY_AFTER
+from metrics import Gauge, collect_stages, record_collected
+
+WARM_UP_TIMEOUT = 300  # seconds warm_up waits for every worker before giving up
+WARM_UP_ATTEMPTS = 2   # fresh pools tried at startup if workers die while warming (e.g. OOM)
+
+_executor = None
+_in_flight = 0
+_all_warm = None  # Barrier the workers meet at once each has warmed up (set in each worker)
+
+def _warm_worker(all_warm=None):
+    """Load the audio stack and JIT-compile the trackers once per worker so requests don't pay for it"""
+    global _all_warm
+    _all_warm = all_warm
+    try:
+        from advanced_analysis import warm_up_pipeline
+        warm_up_pipeline()
+    except Exception as e:
+        # A failed warm-up just means a slower first request, not a dead pool
+        print(f"⚠️ Analysis warm-up failed: {e}")
+
+def _wait_for_all_workers():
+    """
+    Pool task that blocks its worker until every worker is in the barrier
+    Each call holds a worker, so ANALYSIS_WORKERS of them land on distinct, already
+    initialized (warm) workers.
+    """
+    try:
+        _all_warm.wait(WARM_UP_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+
+def start_pool():
+    """Start the worker processes and keep them warm across requests"""
+    global _executor
+    if _executor is not None or ANALYSIS_WORKERS <= 0:
+        return
+    # spawn, not fork: the server process already has threads running
+    context = multiprocessing.get_context("spawn")
+    _executor = ProcessPoolExecutor(
+        max_workers=ANALYSIS_WORKERS,
+        mp_context=context,
+        initializer=_warm_worker,
+        initargs=(context.Barrier(ANALYSIS_WORKERS),)
+    )
+
+async def warm_up():
+    """
+    Return once the analysis path is warm
+    Starts every worker (each warms itself in its initializer) and waits until all
+    of them are through it, or warms this process when analysis runs in threads.
+    """
+    start_pool()
+    loop = asyncio.get_running_loop()
+    if _executor is None:
+        await loop.run_in_executor(None, _warm_worker)
+        return
+    await asyncio.gather(*(loop.run_in_executor(_executor, _wait_for_all_workers) for _ in range(ANALYSIS_WORKERS)))
+
+def stop_pool():
+    """Shut down the worker processes"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def queue_depth() -> int:
+    """Number of analyses running or waiting for a worker"""
+    return _in_flight
+
+Gauge("shruti_analysis_queue_depth", "Analyses running or waiting for a worker", queue_depth)
+
+async def run_analysis(func, *args):
+    """
+    Run a CPU-heavy function in the worker pool without blocking the event loop.
+    Rejects with 503 + Retry-After once all workers are busy and the queue is full.
+    Stage timings recorded inside the worker are shipped back and applied here.
+    """
+    global _in_flight
+    if _in_flight >= max(ANALYSIS_WORKERS, 1) + ANALYSIS_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy analyzing other recordings, please try again shortly",
+            headers={"Retry-After": str(ANALYSIS_RETRY_AFTER)}
+        )
+    
+    start_pool()
+    loop = asyncio.get_running_loop()
+    _in_flight += 1
+    try:
+        result, collected = await loop.run_in_executor(_executor, collect_stages, func, *args)
+        record_collected(collected)
+        return result
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory) - replace the pool for the next request
+        print("⚠️ Analysis worker crashed, restarting pool")
+        stop_pool()
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis worker restarted, please try again",
+            headers={"Retry-After": str(ANALYSIS_RETRY_AFTER)}
+        )
+    finally:
+        _in_flight -= 1
@@ -0,0 +1,160 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from database import reserve_analysis_ids, write_analyses, save_analysis, update_analysis_feedback
+from config import WRITE_BEHIND, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL, WRITE_ID_BLOCK, WRITE_MAX_ATTEMPTS
+from metrics import Counter, stage_timer
+
+# Write-behind for analysis rows: requests get their id straight away and a single
+# writer thread inserts the queued rows in batches, one commit per batch.
+# Rows stay in _pending until their batch commits, so reads that must see a user's
+# own writes call flush_user_writes() first.
+
+_cond = threading.Condition()
+_flush_lock = threading.Lock()  # held for a whole flush; nothing is half-written while we hold it
+_pending = {}        # analysis_id -> row, in queue order
+_pending_users = {}  # user_id -> number of their rows in _pending
+_attempts = {}       # analysis_id -> failed writes of a row that's still queued
+_ids = iter(())
+_writer = None
+_stopping = False
+
+WRITES_DROPPED = Counter(
+    "shruti_write_behind_dropped_total", "Queued analyses given up on after failed writes", ("reason",)
+)
+
+def _next_id() -> int:
+    global _ids
+    analysis_id = next(_ids, None)
+    if analysis_id is None:
+        first = reserve_analysis_ids(WRITE_ID_BLOCK)
+        _ids = iter(range(first, first + WRITE_ID_BLOCK))
+        analysis_id = next(_ids)
+    return analysis_id
+
+def queue_analysis(user_id: int, analysis_type: str, contour: dict = None, **kwargs) -> int:
+    """
+    save_analysis without waiting for the commit, returns the new id
+    The row is written within WRITE_FLUSH_INTERVAL (sooner when WRITE_BATCH_SIZE rows
+    are waiting). Falls back to save_analysis when WRITE_BEHIND is off.
+    """
+    if not WRITE_BEHIND:
+        return save_analysis(user_id, analysis_type, contour, **kwargs)
+    _start_writer()
+    with _cond:
+        analysis_id = _next_id()
+        _pending[analysis_id] = {
+            **kwargs,
+            "id": analysis_id,
+            "user_id": user_id,
+            "analysis_type": analysis_type,
+            # Queue time, same format as the column's CURRENT_TIMESTAMP default
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "contour": contour
+        }
+        _pending_users[user_id] = _pending_users.get(user_id, 0) + 1
+        # Wake the idle writer to start the flush timer, or flush now if the batch is full
+        if len(_pending) == 1 or len(_pending) >= WRITE_BATCH_SIZE:
+            _cond.notify()
+    return analysis_id
+
+def _dequeue(rows: list):
+    with _cond:
+        for row in rows:
+            del _pending[row["id"]]
+            _attempts.pop(row["id"], None)
+            _pending_users[row["user_id"]] -= 1
+            if not _pending_users[row["user_id"]]:
+                del _pending_users[row["user_id"]]
+
+def _write_rows_separately(batch: list) -> int:
+    """
+    After a failed batch: write each row in its own transaction so one bad row
+    can't hold back the rest. A row that fails on its own is dropped straight away
+    unless the database was just busy (OperationalError), which gets WRITE_MAX_ATTEMPTS.
+    """
+    written, dropped = [], []
+    for row in batch:
+        try:
+            write_analyses([row])
+            written.append(row)
+        except Exception as e:
+            transient = isinstance(e, sqlite3.OperationalError)
+            _attempts[row["id"]] = _attempts.get(row["id"], 0) + 1
+            if transient and _attempts[row["id"]] < WRITE_MAX_ATTEMPTS:
+                continue
+            print(f"❌ Dropping queued analysis {row['id']} (user {row['user_id']}): {e}")
+            WRITES_DROPPED.inc(reason="busy" if transient else "error")
+            dropped.append(row)
+    _dequeue(written + dropped)
+    return len(written)
+
+def flush_writes() -> int:
+    """Write everything queued so far in one transaction, returns the number of rows"""
+    with _flush_lock:
+        with _cond:
+            batch = list(_pending.values())
+        if not batch:
+            return 0
+        try:
+            with stage_timer("db_flush"):
+                write_analyses(batch)
+        except Exception as e:
+            print(f"⚠️ Analysis write-behind flush failed ({len(batch)} rows), retrying row by row: {e}")
+            return _write_rows_separately(batch)
+        _dequeue(batch)
+        return len(batch)
+
+def flush_user_writes(user_id: int):
+    """Make sure the user's queued analyses are in the database (read-your-writes)"""
+    with _cond:
+        waiting = user_id in _pending_users
+    if waiting:
+        flush_writes()
+
+def update_feedback(analysis_id: int, feedback: str):
+    """update_analysis_feedback that also reaches rows still waiting to be written"""
+    with _flush_lock:
+        with _cond:
+            row = _pending.get(analysis_id)
+            if row is not None:
+                row["feedback"] = feedback
+                return
+    update_analysis_feedback(analysis_id, feedback)
+
+def _run_writer():
+    while True:
+        with _cond:
+            if not _pending and not _stopping:
+                _cond.wait()
+            if _stopping:
+                return
+            if len(_pending) < WRITE_BATCH_SIZE:
+                # Give concurrent requests a moment to join this batch
+                _cond.wait(WRITE_FLUSH_INTERVAL)
+        try:
+            flush_writes()
+        except Exception as e:
+            # Never let the only writer die; whatever is still queued goes next round
+            print(f"⚠️ Analysis writer error: {e}")
+
+def _start_writer():
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        with _cond:
+            if _writer is None or not _writer.is_alive():
+                _writer = threading.Thread(target=_run_writer, name="analysis-writer", daemon=True)
+                _writer.start()
+
+def stop_writer():
+    """Stop the writer thread and write whatever is still queued"""
+    global _writer, _stopping
+    if _writer is not None:
+        with _cond:
+            _stopping = True
+            _cond.notify()
+        _writer.join()
+        _writer = None
+        _stopping = False
+    flush_writes()
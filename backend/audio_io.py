@@ -0,0 +1,125 @@
+import io
+import os
+import tempfile
+
+import soundfile as sf
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from config import MAX_AUDIO_DURATION, MAX_UPLOAD_BYTES
+
+UPLOAD_CHUNK_BYTES = 64 * 1024
+ANALYSIS_SAMPLE_RATE = 16000
+
+class AudioRejected(Exception):
+    """Raised when an upload is too long to analyze (plain Exception so it pickles across the pool)"""
+
+class UploadLimitMiddleware:
+    """
+    Cap request bodies while they stream in
+    A Content-Length over the limit is refused before anything is read; otherwise
+    (including chunked uploads) bytes are counted as they arrive and the request is
+    answered with 413 the moment it passes the limit, before form parsing completes.
+    `limits` maps paths to their own limit, everything else gets `default`.
+    """
+
+    def __init__(self, app, default: int, limits: dict = None):
+        self.app = app
+        self.default = default
+        self.limits = limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limits.get(scope["path"], self.default)
+        # Allow one chunk of slack for multipart boundaries and form fields
+        max_bytes = limit + UPLOAD_CHUNK_BYTES
+        too_large = JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload is too large (max {limit // (1024 * 1024)} MB)"}
+        )
+
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > max_bytes:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    rejected = True
+                    if not response_started:
+                        await too_large(scope, receive, send)
+                    # Looks like a hang-up to the app, so it stops parsing the body
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                return  # already answered with 413
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+async def read_upload(upload) -> bytes:
+    """Read an upload in chunks, stopping as soon as it passes MAX_UPLOAD_BYTES"""
+    data = bytearray()
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        data.extend(chunk)
+        if len(data) > MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Recording is too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"
+            )
+    return bytes(data)
+
+def load_audio(audio, sr: int = ANALYSIS_SAMPLE_RATE):
+    """
+    Decode audio to mono float samples at `sr`
+    Accepts raw upload bytes or a file path. Bytes are decoded from memory; only
+    containers libsndfile can't read (webm/mp4 from MediaRecorder) go through a
+    private temp file for ffmpeg, never a shared path.
+    """
+    import librosa  # heavy (numba/scipy), loaded on first decode rather than at server start
+
+    if not isinstance(audio, (bytes, bytearray)):
+        return librosa.load(audio, sr=sr, duration=MAX_AUDIO_DURATION)
+
+    try:
+        info = sf.info(io.BytesIO(audio))
+    except RuntimeError:
+        info = None
+
+    if info is not None:
+        # Header tells us the length, so reject before decoding anything
+        if info.duration > MAX_AUDIO_DURATION:
+            raise AudioRejected(f"Recording is too long (max {MAX_AUDIO_DURATION} seconds)")
+        return librosa.load(io.BytesIO(audio), sr=sr)
+
+    with tempfile.NamedTemporaryFile(suffix=".audio", delete=False) as f:
+        f.write(audio)
+        path = f.name
+    try:
+        # Decode one frame past the limit - enough to know it's too long
+        y, sr = librosa.load(path, sr=sr, duration=MAX_AUDIO_DURATION + 0.1)
+    finally:
+        os.remove(path)
+    if len(y) > MAX_AUDIO_DURATION * sr:
+        raise AudioRejected(f"Recording is too long (max {MAX_AUDIO_DURATION} seconds)")
+    return y, sr
@@ -1,3 +1,4 @@
+import asyncio
 import hashlib
 import secrets
 from datetime import datetime, timedelta
@@ -6,12 +7,17 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from database import (
     user_exists, create_user, get_user_by_email, 
-    create_session, get_user_by_token
+    create_session, get_user_by_token, delete_session,
+    purge_expired_sessions, run_db
 )
-from config import SESSION_EXPIRY_DAYS
+from ttl_cache import LRUCache
+from config import SESSION_EXPIRY_DAYS, AUTH_CACHE_SIZE, AUTH_CACHE_TTL, SESSION_PURGE_INTERVAL
 
 security = HTTPBearer()
 
+# token -> user dict, so authenticated requests don't hit the sessions table
+_token_cache = LRUCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
 def hash_password(password: str) -> str:
     """Hash a password using SHA256"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -59,12 +65,49 @@ def login_user(email: str, password: str):
         }
     }
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def authenticate_token(token: str):
+    """User dict for a session token, or None - served from memory when cached"""
+    cached = _token_cache.get(token)
+    if cached:
+        return cached
+    
+    user = await run_db(get_user_by_token, token)
+    if not user:
+        return None
+    
+    current_user = {"id": user[0], "email": user[1], "name": user[2]}
+    # Never cache past the session's own expiry
+    session_left = (datetime.fromisoformat(str(user[3])) - datetime.now()).total_seconds()
+    _token_cache.put(token, current_user, ttl=session_left)
+    return current_user
+
+def invalidate_token(token: str):
+    """Forget a cached session (logout, revoked token)"""
+    _token_cache.invalidate(token)
+
+def invalidate_user(user_id: int):
+    """Forget every cached session of a user (e.g. after a password or profile change)"""
+    _token_cache.invalidate_where(lambda cached_user: cached_user["id"] == user_id)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user"""
-    token = credentials.credentials
-    user = get_user_by_token(token)
+    user = await authenticate_token(credentials.credentials)
     
     if not user:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
-    return {"id": user[0], "email": user[1], "name": user[2]}
+    return user
+
+async def logout_user(token: str):
+    """End a session"""
+    await run_db(delete_session, token)
+    invalidate_token(token)
+    return {"status": "logged out"}
+
+async def purge_sessions_periodically():
+    """Background task: delete expired sessions so the table doesn't grow forever"""
+    while True:
+        removed = await run_db(purge_expired_sessions)
+        if removed:
+            print(f"🧹 Purged {removed} expired sessions")
+        await asyncio.sleep(SESSION_PURGE_INTERVAL)
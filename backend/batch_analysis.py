@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+from fastapi import HTTPException
+from advanced_analysis import analyze_pitch_detailed, client_result
+from ai_teacher import generate_shruti_feedback_async, cacheable_feedback
+from analysis_pool import run_analysis
+from analysis_cache import analysis_cache_key, get_cached_analysis, put_cached_analysis
+from audio_io import AudioRejected
+from database import save_analyses, run_db
+from config import ANALYSIS_WORKERS, BATCH_FEEDBACK_CONCURRENCY
+from metrics import stage_timer
+
+async def _analyze_one(index, filename, audio_bytes, tonic, tracker, analysis_slots, feedback_slots):
+    """Analysis + feedback for one file of a batch; errors are reported, not raised"""
+    item = {"index": index, "filename": filename}
+    try:
+        cache_key = analysis_cache_key(audio_bytes, tonic, tracker)
+        cached = await run_db(get_cached_analysis, cache_key)
+        if cached and cached["feedback"] is not None:
+            return {**item, **cached["result"], "feedback": cached["feedback"], "cache": "hit"}
+
+        if cached:
+            # Analysis is cached but its feedback was a fallback - ask again
+            result = cached["result"]
+        else:
+            async with analysis_slots:
+                result = await run_analysis(analyze_pitch_detailed, audio_bytes, tonic, tracker)
+            if not result:
+                return {**item, "error": "No voice detected"}
+
+        async with feedback_slots:
+            feedback, source = await generate_shruti_feedback_async(
+                swara=result['swara'],
+                deviation=result['deviation'],
+                stability=result['overall_stability'],
+                detailed_analysis=result
+            )
+        await run_db(put_cached_analysis, cache_key, {"result": result, "feedback": cacheable_feedback(feedback, source)})
+        return {**item, **result, "feedback": feedback, "cache": "hit" if cached else "miss"}
+    except AudioRejected as e:
+        return {**item, "error": str(e)}
+    except HTTPException as e:
+        return {**item, "error": e.detail}
+    except Exception as e:
+        print(f"Batch analysis error ({filename}): {e}")
+        return {**item, "error": "Analysis failed"}
+
+async def analyze_batch(uploads, tonic: float, tracker: str, user_id: int):
+    """
+    Analyze many recordings and yield one NDJSON line per file as each finishes
+    Files are spread over the worker pool (at most one per worker at a time so a
+    batch can't fill the shared queue on its own), feedback runs up to
+    BATCH_FEEDBACK_CONCURRENCY at once, and all rows are saved in one transaction.
+    The last line is {"type": "saved", "analysis_ids": {index: id}}.
+    """
+    analysis_slots = asyncio.Semaphore(max(ANALYSIS_WORKERS, 1))
+    feedback_slots = asyncio.Semaphore(BATCH_FEEDBACK_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(_analyze_one(index, filename, audio_bytes, tonic, tracker, analysis_slots, feedback_slots))
+        for index, (filename, audio_bytes) in enumerate(uploads)
+    ]
+
+    finished = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            finished.append(item)
+            yield json.dumps({"type": "result", **client_result(item)}) + "\n"
+    finally:
+        # Client went away: don't keep analyzing for nobody
+        for task in tasks:
+            task.cancel()
+
+    saved = [item for item in finished if "error" not in item]
+    with stage_timer("db_save_batch"):
+        ids = await run_db(save_analyses, user_id, "single_note", [
+            {
+                "swara": item['swara'],
+                "deviation": item['deviation'],
+                "stability": item['overall_stability'],
+                "feedback": item['feedback'],
+                "audio_filename": item['filename'],
+                "contour": item.get('full_contour')
+            }
+            for item in saved
+        ])
+    yield json.dumps({
+        "type": "saved",
+        "analysis_ids": {item["index"]: analysis_id for item, analysis_id in zip(saved, ids)}
+    }) + "\n"
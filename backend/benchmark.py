@@ -0,0 +1,181 @@
+"""
+Micro-benchmark for the analysis pipeline on synthetic voices
+
+    python benchmark.py                          # time + accuracy check, all scenarios
+    python benchmark.py --tracker yin --repeat 5
+    python benchmark.py --save-baseline bench.json
+    python benchmark.py --baseline bench.json    # exit 1 if a stage got slower than --threshold
+
+Each scenario (see synthetic_voice.SCENARIOS) is rendered at RECORDING_SAMPLE_RATE,
+encoded to WAV and pushed through the same stages as /analyze: decode, resample,
+pitch tracking, post-processing and the rule-based feedback heuristics.
+"""
+import argparse
+import io
+import json
+import sys
+import time
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from audio_io import ANALYSIS_SAMPLE_RATE
+from pitch_trackers import PITCH_TRACKERS, track_pitch
+from advanced_analysis import summarize_pitch
+from ai_teacher import _contour_insights, _fallback_feedback
+from synthetic_voice import SCENARIOS, synth_voice
+from config import DEFAULT_TONIC
+
+RECORDING_SAMPLE_RATE = 44100  # what browsers usually record at, so resampling is exercised
+STAGES = ("decode", "resample", "track", "postprocess", "feedback")
+
+# Allowed error against ground truth (cents)
+DEVIATION_TOLERANCE = 5.0
+STABILITY_TOLERANCE = 5.0
+
+# Slowdowns smaller than this are timer noise, whatever the percentage
+MIN_REGRESSION_MS = 2.0
+
+def run_pipeline(wav_bytes: bytes, tracker: str, tonic: float):
+    """One pass through every stage, returns (result, feedback, {stage: seconds})"""
+    timings = {}
+
+    start = time.perf_counter()
+    y, orig_sr = sf.read(io.BytesIO(wav_bytes), dtype="float32")
+    timings["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y = librosa.resample(y, orig_sr=orig_sr, target_sr=ANALYSIS_SAMPLE_RATE)
+    timings["resample"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    f0, voiced_flag, voiced_probs = track_pitch(y, ANALYSIS_SAMPLE_RATE, tracker)
+    timings["track"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = summarize_pitch(f0, voiced_flag, voiced_probs, ANALYSIS_SAMPLE_RATE, tonic, tracker)
+    timings["postprocess"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    feedback = None
+    if result:
+        display_dev = min(abs(result["deviation"]), 100)
+        insights = _contour_insights(result["overall_stability"], result)
+        feedback = _fallback_feedback(result["swara"], display_dev, result["overall_stability"], *insights)
+    timings["feedback"] = time.perf_counter() - start
+
+    return result, feedback, timings
+
+def check_accuracy(result, truth):
+    """List of problems with `result` against the synthetic ground truth (empty = ok)"""
+    if result is None:
+        return ["no voiced frames detected"]
+
+    problems = []
+    expected = ((truth["median_cents"] + 600) % 1200) - 600
+    if abs(result["deviation"] - expected) > DEVIATION_TOLERANCE:
+        problems.append(f"deviation {result['deviation']} vs truth {expected:.1f}")
+    if abs(result["overall_stability"] - truth["std_cents"]) > STABILITY_TOLERANCE:
+        problems.append(f"stability {result['overall_stability']} vs truth {truth['std_cents']:.1f}")
+    if result["actual_swara"] != "Sa":
+        problems.append(f"heard {result['actual_swara']} instead of Sa")
+    if result["has_vibrato"] != truth["vibrato"]:
+        problems.append(f"has_vibrato {result['has_vibrato']} vs truth {truth['vibrato']}")
+    wobble_info = _contour_insights(result["overall_stability"], result)[2]
+    if wobble_info and not truth["wavering"]:
+        # e.g. a steady glide read as wavering
+        problems.append(f"wobble_range {result['phases']['sustain']['wobble_range']} on a steady note: {wobble_info!r}")
+    return problems
+
+def run_benchmark(trackers, scenarios, repeat: int, tonic: float = DEFAULT_TONIC):
+    """Median stage timings (ms) per tracker/scenario plus any accuracy failures"""
+    report = {}
+    failures = []
+    for tracker in trackers:
+        for name in scenarios:
+            y, sr, truth = synth_voice(tonic=tonic, sr=RECORDING_SAMPLE_RATE, **SCENARIOS[name])
+            buffer = io.BytesIO()
+            sf.write(buffer, y, sr, format="WAV", subtype="PCM_16")
+            wav_bytes = buffer.getvalue()
+
+            runs = []
+            for _ in range(repeat):
+                result, _, timings = run_pipeline(wav_bytes, tracker, tonic)
+                runs.append(timings)
+
+            stage_ms = {stage: round(1000 * float(np.median([run[stage] for run in runs])), 2) for stage in STAGES}
+            stage_ms["total"] = round(sum(stage_ms.values()), 2)
+            stage_ms["realtime_factor"] = round(truth["duration"] / (stage_ms["total"] / 1000), 1)
+            report[f"{tracker}/{name}"] = stage_ms
+
+            for problem in check_accuracy(result, truth):
+                failures.append(f"{tracker}/{name}: {problem}")
+    return report, failures
+
+def compare_to_baseline(report, baseline, threshold: float):
+    """Stages more than `threshold` (fraction) slower than the baseline"""
+    regressions = []
+    for key, stage_ms in report.items():
+        for stage in STAGES + ("total",):
+            before = baseline.get(key, {}).get(stage)
+            if before is None or stage_ms[stage] - before < MIN_REGRESSION_MS:
+                continue
+            if stage_ms[stage] > before * (1 + threshold):
+                regressions.append(f"{key} {stage}: {before} ms -> {stage_ms[stage]} ms")
+    return regressions
+
+def print_report(report):
+    header = f"{'case':<22}" + "".join(f"{stage:>12}" for stage in STAGES + ("total",)) + f"{'x realtime':>12}"
+    print(header)
+    for key, stage_ms in report.items():
+        row = f"{key:<22}" + "".join(f"{stage_ms[stage]:>12.2f}" for stage in STAGES + ("total",))
+        print(row + f"{stage_ms['realtime_factor']:>12.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracker", action="append", choices=sorted(PITCH_TRACKERS),
+                        help="tracker to benchmark (repeatable, default: all)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the median is reported")
+    parser.add_argument("--baseline", help="JSON from --save-baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", help="write this run's timings to a JSON file")
+    args = parser.parse_args(argv)
+
+    trackers = args.tracker or sorted(PITCH_TRACKERS)
+    scenarios = args.scenario or list(SCENARIOS)
+
+    # Warm-up so import/JIT/FFT-plan costs don't land on the first case
+    run_pipeline(_silence_wav(), trackers[0], DEFAULT_TONIC)
+
+    report, failures = run_benchmark(trackers, scenarios, max(args.repeat, 1))
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline saved to {args.save_baseline}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.threshold)
+
+    for failure in failures:
+        print(f"❌ Accuracy: {failure}")
+    for regression in regressions:
+        print(f"🐢 Regression: {regression}")
+    if failures or regressions:
+        return 1
+    print("✅ All cases within tolerance")
+    return 0
+
+def _silence_wav():
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(RECORDING_SAMPLE_RATE // 2, dtype=np.float32), RECORDING_SAMPLE_RATE, format="WAV")
+    return buffer.getvalue()
+
+if __name__ == "__main__":
+    sys.exit(main())
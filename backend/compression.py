@@ -0,0 +1,94 @@
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional - without it only gzip is offered
+    brotli = None
+
+from response_encoding import BINARY_MEDIA_TYPE
+
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", BINARY_MEDIA_TYPE)
+MIN_COMPRESS_BYTES = 1024  # smaller bodies aren't worth the CPU or the header bytes
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5         # well past gzip's ratio while still a few ms per response
+
+def choose_encoding(accept_encoding: str):
+    """Best content coding the client accepts ("br", "gzip") or None"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class CompressionMiddleware:
+    """
+    Content-negotiated gzip / brotli for JSON and binary analysis responses
+    Only COMPRESSIBLE_TYPES are buffered and compressed; streamed responses (NDJSON
+    batches, SSE) pass through untouched so every line reaches the client as it's sent.
+    """
+
+    def __init__(self, app, minimum_size: int = MIN_COMPRESS_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+        chunks = []
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = not content_type.startswith(COMPRESSIBLE_TYPES) or "content-encoding" in headers
+                if passthrough:
+                    await send(message)
+                else:
+                    # Hold the headers until the whole body is here
+                    headers.add_vary_header("Accept-Encoding")
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            # Inner middleware re-streams even plain responses, so collect the chunks
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
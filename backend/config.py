@@ -10,6 +10,12 @@ ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 print(f"DEBUG: API Key loaded: {ANTHROPIC_API_KEY[:20]}..." if ANTHROPIC_API_KEY else "DEBUG: No API key found!")
 # Database
 DATABASE_NAME = "shruti.db"
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 4))  # threads (each with its own connection) for DB calls
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND", "1") == "1"  # batch analysis inserts off the request path
+WRITE_BATCH_SIZE = 64  # queued analyses that trigger an immediate flush
+WRITE_FLUSH_INTERVAL = float(os.environ.get("WRITE_FLUSH_INTERVAL", 0.1))  # seconds, max age of an unflushed row
+WRITE_ID_BLOCK = 256  # analysis ids reserved per DB round trip
+WRITE_MAX_ATTEMPTS = 5  # flushes a queued row may fail while the DB is busy before it's dropped
 
 # Audio Settings
 DEFAULT_TONIC = 261.63  # C4 as Sa
@@ -20,6 +26,53 @@ MIN_NOTE_DURATION_FRAMES = 5
 
 # Session Settings
 SESSION_EXPIRY_DAYS = 7
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 10000))  # cached token -> user lookups
+AUTH_CACHE_TTL = int(os.environ.get("AUTH_CACHE_TTL", 300))  # seconds, also capped at session expiry
+SESSION_PURGE_INTERVAL = 3600  # seconds between expired-session cleanups
 
 # Audio Processing
-MAX_AUDIO_DURATION = 30  # seconds
\ No newline at end of file
+MAX_AUDIO_DURATION = 30  # seconds
+# Analysis Worker Pool
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", os.cpu_count() or 1))  # 0 = run in a thread
+ANALYSIS_QUEUE_LIMIT = int(os.environ.get("ANALYSIS_QUEUE_LIMIT", 8))  # waiting jobs beyond busy workers
+ANALYSIS_RETRY_AFTER = 5  # seconds, sent with 503 when the queue is full
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024  # reject larger uploads before decoding
+
+# Durable Job Queue (worker.py)
+ANALYSIS_MODE = os.environ.get("ANALYSIS_MODE", "inline")  # "inline" or "queued" (submit / poll /jobs/{id})
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 60))  # a job whose worker stops renewing is re-run
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1.0))  # seconds an idle worker sleeps
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 7 * 24 * 3600))  # seconds finished jobs are kept
+
+# Pitch Tracking
+PITCH_TRACKER = os.environ.get("PITCH_TRACKER", "pyin")  # "pyin" (accurate) or "yin" (fast)
+SILENCE_TRIM = os.environ.get("SILENCE_TRIM", "1") == "1"  # skip dead air before pitch tracking
+SILENCE_MARGIN_DB = 10      # frames less than this above the noise floor count as silence
+SILENCE_MAX_DB = -25        # ...but frames within this of the loudest one never do
+SILENCE_MIN_GAP = 0.3       # seconds, shorter internal pauses are tracked through
+SILENCE_PADDING = 0.1       # seconds of context kept around each sung region
+
+# Pitch Graph
+CONTOUR_POINTS = 300        # default point budget for the graph in /analyze responses
+CONTOUR_MIN_POINTS = 20     # range a client may ask for with max_points
+CONTOUR_MAX_POINTS = 2000
+CONTOUR_PAGE_LIMIT = 5000   # max points per page of /history/{id}/contour
+
+# Analysis Result Cache
+ANALYSIS_CACHE_SIZE = int(os.environ.get("ANALYSIS_CACHE_SIZE", 256))  # in-memory LRU entries
+ANALYSIS_CACHE_PERSIST = os.environ.get("ANALYSIS_CACHE_PERSIST", "1") == "1"  # SQLite tier on/off
+ANALYSIS_CACHE_MAX_ROWS = int(os.environ.get("ANALYSIS_CACHE_MAX_ROWS", 5000))
+ANALYSIS_CACHE_TTL = int(os.environ.get("ANALYSIS_CACHE_TTL", 7 * 24 * 3600))  # seconds
+
+# AI Feedback
+FEEDBACK_TIMEOUT = float(os.environ.get("FEEDBACK_TIMEOUT", 8.0))  # seconds before rule-based fallback
+FEEDBACK_MODE = os.environ.get("FEEDBACK_MODE", "inline")  # "inline" or "deferred" (poll / SSE)
+FEEDBACK_CACHE_VARIANTS = int(os.environ.get("FEEDBACK_CACHE_VARIANTS", 3))  # texts kept per signature, rotated
+FEEDBACK_CACHE_TTL = int(os.environ.get("FEEDBACK_CACHE_TTL", 30 * 24 * 3600))  # seconds
+FEEDBACK_CACHE_MAX_ROWS = int(os.environ.get("FEEDBACK_CACHE_MAX_ROWS", 5000))
+
+# Batch Analysis
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", 50))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", 100 * 1024 * 1024))  # whole request
+BATCH_FEEDBACK_CONCURRENCY = int(os.environ.get("BATCH_FEEDBACK_CONCURRENCY", 4))  # parallel Claude calls per batch
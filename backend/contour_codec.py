@@ -0,0 +1,29 @@
+import zlib
+
+import numpy as np
+from response_encoding import CONTOUR_SCALE
+
+CONTOUR_ENCODING = 1  # stored with each row so the format can change later
+ZLIB_LEVEL = 9        # encoded once per analysis, so spend the CPU on size
+
+def encode_contour(frame_indices, cents) -> bytes:
+    """
+    Pack a full-resolution contour for storage
+    Cents are quantized to CONTOUR_SCALE steps (lossless for the 0.1-cent rounded
+    full_contour). Both series are delta-encoded as int32; frame steps > 1 are the
+    unvoiced gaps. The bytes are shuffled so the mostly-zero high bytes of every
+    delta sit together, then zlib-compressed.
+    """
+    quantized = np.round(np.asarray(cents, dtype=np.float64) / CONTOUR_SCALE).astype(np.int64)
+    frames = np.asarray(frame_indices, dtype=np.int64)
+    deltas = np.concatenate([np.diff(quantized, prepend=0), np.diff(frames, prepend=0)]).astype("<i4")
+    shuffled = deltas.view(np.uint8).reshape(-1, 4).T
+    return zlib.compress(shuffled.tobytes(), ZLIB_LEVEL)
+
+def decode_contour(data: bytes, count: int):
+    """(frame_indices int64, cents float64) from encode_contour output holding `count` points"""
+    shuffled = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(4, 2 * count)
+    deltas = np.ascontiguousarray(shuffled.T).view("<i4").ravel()
+    cents = np.cumsum(deltas[:count], dtype=np.int64) * CONTOUR_SCALE
+    frame_indices = np.cumsum(deltas[count:], dtype=np.int64)
+    return frame_indices, cents
@@ -1,10 +1,46 @@
+import asyncio
+import base64
+import functools
 import sqlite3
-from datetime import datetime
-from config import DATABASE_NAME
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from contour_codec import CONTOUR_ENCODING, encode_contour, decode_contour
+from config import DATABASE_NAME, DB_POOL_SIZE
+
+_local = threading.local()
+
+# Blocking DB calls from async handlers run here, so there are at most
+# DB_POOL_SIZE connections and none of them block the event loop
+_db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+def get_connection():
+    """
+    Per-thread connection, opened once and reused
+    WAL lets readers run alongside the writer; synchronous=NORMAL is durable in WAL
+    mode except on power loss. Reuse also keeps sqlite3's prepared statement cache warm.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DATABASE_NAME, timeout=5, cached_statements=256)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA busy_timeout = 5000')  # ms to wait on a locked DB
+        conn.execute('PRAGMA cache_size = -16000')  # ~16 MB page cache
+        conn.execute('PRAGMA mmap_size = 134217728')  # 128 MB memory-mapped reads
+        conn.execute('PRAGMA temp_store = MEMORY')
+        _local.conn = conn
+    return conn
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database function on the DB thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
 
 def init_db():
     """Initialize database tables"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = get_connection()
     
     conn.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -24,6 +60,7 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)')
     
     conn.execute('''
         CREATE TABLE IF NOT EXISTS analyses (
@@ -41,68 +78,207 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analyses_user_created ON analyses (user_id, created_at, id)')
+    
+    # Full-resolution pitch contour of a single-note analysis, compressed (see contour_codec).
+    # Separate from analyses so history listings never read it.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_contours (
+            analysis_id INTEGER PRIMARY KEY,
+            hop_seconds REAL NOT NULL,
+            point_count INTEGER NOT NULL,
+            encoding INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            FOREIGN KEY (analysis_id) REFERENCES analyses (id)
+        )
+    ''')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analysis_cache_created ON analysis_cache (created_at)')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS feedback_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            signature TEXT NOT NULL,
+            feedback TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            served_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_feedback_cache_signature ON feedback_cache (signature, served_at)')
+    
+    # Durable analysis jobs, claimed by worker.py processes under a lease (see job_queue)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            params TEXT NOT NULL,
+            audio BLOB,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL,
+            result TEXT,
+            error TEXT,
+            analysis_id INTEGER,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs (status, id)')
+    
+    # Running per-user / swara / day (UTC) aggregates of scored analyses, kept up to
+    # date on insert so /progress never scans history. *_m2 is the sum of squared
+    # differences from the mean (Welford), variance = m2 / count.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS progress_daily (
+            user_id INTEGER NOT NULL,
+            swara TEXT NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            deviation_mean REAL NOT NULL,
+            deviation_m2 REAL NOT NULL,
+            stability_mean REAL NOT NULL,
+            stability_m2 REAL NOT NULL,
+            best_score INTEGER NOT NULL,
+            PRIMARY KEY (user_id, swara, day),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''')
+    conn.commit()
+    
+    # New table (or nothing scored yet): build it from existing history once. The
+    # check and the fill share one write lock, as web and worker.py start together.
+    conn.execute('BEGIN IMMEDIATE')
+    if conn.execute('SELECT NOT EXISTS (SELECT 1 FROM progress_daily)').fetchone()[0]:
+        conn.execute('''
+            INSERT INTO progress_daily
+            SELECT user_id, swara, date(created_at), COUNT(*),
+                   AVG(deviation), MAX(0, SUM(deviation * deviation) - COUNT(*) * AVG(deviation) * AVG(deviation)),
+                   AVG(stability), MAX(0, SUM(stability * stability) - COUNT(*) * AVG(stability) * AVG(stability)),
+                   MAX(CAST(MAX(0, 100 - ABS(deviation)) AS INTEGER))
+            FROM analyses
+            WHERE swara IS NOT NULL AND deviation IS NOT NULL AND stability IS NOT NULL
+            GROUP BY user_id, swara, date(created_at)
+        ''')
     
     conn.commit()
-    conn.close()
 
 def create_user(email: str, password_hash: str, name: str = ""):
     """Create a new user"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.execute(
-        'INSERT INTO users (email, password_hash, name) VALUES (?, ?, ?)',
-        (email, password_hash, name)
-    )
-    user_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return user_id
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            'INSERT INTO users (email, password_hash, name) VALUES (?, ?, ?)',
+            (email, password_hash, name)
+        )
+    return cursor.lastrowid
 
 def get_user_by_email(email: str):
     """Get user by email"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = get_connection()
     cursor = conn.execute(
         'SELECT id, email, name, password_hash FROM users WHERE email = ?',
         (email,)
     )
     user = cursor.fetchone()
-    conn.close()
     return user
 
 def user_exists(email: str) -> bool:
     """Check if user exists"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = get_connection()
     cursor = conn.execute('SELECT id FROM users WHERE email = ?', (email,))
     exists = cursor.fetchone() is not None
-    conn.close()
     return exists
 
 def create_session(token: str, user_id: int, expires_at: datetime):
     """Create a new session"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.execute(
-        'INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
-        (token, user_id, expires_at)
-    )
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            'INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
+            (token, user_id, expires_at)
+        )
 
 def get_user_by_token(token: str):
-    """Get user by session token"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    """Get user (id, email, name, session expires_at) by session token"""
+    conn = get_connection()
     cursor = conn.execute('''
-        SELECT users.id, users.email, users.name 
+        SELECT users.id, users.email, users.name, sessions.expires_at
         FROM sessions 
         JOIN users ON sessions.user_id = users.id
         WHERE sessions.token = ? AND sessions.expires_at > ?
     ''', (token, datetime.now()))
     user = cursor.fetchone()
-    conn.close()
     return user
 
-def save_analysis(user_id: int, analysis_type: str, **kwargs):
-    """Save analysis result"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    
+def delete_session(token: str):
+    """Delete a session (logout)"""
+    conn = get_connection()
+    with conn:
+        conn.execute('DELETE FROM sessions WHERE token = ?', (token,))
+
+def purge_expired_sessions() -> int:
+    """Delete expired sessions, returns how many were removed"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (datetime.now(),))
+    return cursor.rowcount
+
+ANALYSIS_COLUMNS = [
+    "id", "user_id", "analysis_type", "swara", "deviation", "stability", "feedback",
+    "swara_sequence", "detected_raga", "audio_filename", "created_at"
+]
+
+_CONTOUR_INSERT = '''
+    INSERT INTO analysis_contours (analysis_id, hop_seconds, point_count, encoding, data) VALUES (?, ?, ?, ?, ?)
+'''
+
+def _contour_values(analysis_id: int, contour: dict):
+    return (
+        analysis_id,
+        contour["hop_seconds"],
+        len(contour["cents"]),
+        CONTOUR_ENCODING,
+        encode_contour(contour["frame_indices"], contour["cents"])
+    )
+
+def _insert_contour(conn, analysis_id: int, contour: dict):
+    conn.execute(_CONTOUR_INSERT, _contour_values(analysis_id, contour))
+
+# One Welford step per analysis; the SET expressions all see the row's old values
+_PROGRESS_UPSERT = '''
+    INSERT INTO progress_daily (
+        user_id, swara, day, count, deviation_mean, deviation_m2, stability_mean, stability_m2, best_score
+    ) VALUES (?, ?, ?, 1, ?, 0, ?, 0, CAST(MAX(0, 100 - ABS(?)) AS INTEGER))
+    ON CONFLICT (user_id, swara, day) DO UPDATE SET
+        count = count + 1,
+        deviation_mean = deviation_mean + (excluded.deviation_mean - deviation_mean) / (count + 1),
+        deviation_m2 = deviation_m2 + (excluded.deviation_mean - deviation_mean)
+                       * (excluded.deviation_mean - deviation_mean) * count / (count + 1),
+        stability_mean = stability_mean + (excluded.stability_mean - stability_mean) / (count + 1),
+        stability_m2 = stability_m2 + (excluded.stability_mean - stability_mean)
+                       * (excluded.stability_mean - stability_mean) * count / (count + 1),
+        best_score = MAX(best_score, excluded.best_score)
+'''
+
+def _update_progress(conn, rows: list):
+    """Fold scored analyses (dicts with user_id, swara, deviation, stability, day) into progress_daily"""
+    conn.executemany(_PROGRESS_UPSERT, [
+        (row["user_id"], row["swara"], row["day"], row["deviation"], row["stability"], row["deviation"])
+        for row in rows
+        if row.get("swara") is not None and row.get("deviation") is not None and row.get("stability") is not None
+    ])
+
+def insert_analysis(conn, user_id: int, analysis_type: str, contour: dict = None, **kwargs):
+    """INSERT one analysis (and its contour) on `conn` inside the caller's transaction, returns its id"""
     fields = ['user_id', 'analysis_type']
     values = [user_id, analysis_type]
     
@@ -114,38 +290,156 @@ def save_analysis(user_id: int, analysis_type: str, **kwargs):
     placeholders = ', '.join(['?' for _ in values])
     field_names = ', '.join(fields)
     
-    conn.execute(
+    cursor = conn.execute(
         f'INSERT INTO analyses ({field_names}) VALUES ({placeholders})',
         values
     )
-    conn.commit()
-    conn.close()
+    if contour:
+        _insert_contour(conn, cursor.lastrowid, contour)
+    _update_progress(conn, [{
+        **kwargs, "user_id": user_id, "day": datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    }])
+    return cursor.lastrowid
 
-def get_user_history(user_id: int, limit: int = 50):
-    """Get user's analysis history"""
-    conn = sqlite3.connect(DATABASE_NAME)
+def save_analysis(user_id: int, analysis_type: str, contour: dict = None, **kwargs):
+    """Save analysis result (and its full-resolution contour, if given), returns its id"""
+    conn = get_connection()
+    with conn:
+        return insert_analysis(conn, user_id, analysis_type, contour, **kwargs)
+
+def save_analyses(user_id: int, analysis_type: str, rows: list):
+    """
+    Save many analysis results in one transaction (one commit for the whole batch)
+    Each row is a dict of analyses columns plus an optional "contour"; returns the
+    new ids in the same order
+    """
+    conn = get_connection()
+    with conn:
+        return [insert_analysis(conn, user_id, analysis_type, **row) for row in rows]
+
+def reserve_analysis_ids(count: int) -> int:
+    """
+    Reserve `count` consecutive analysis ids, returns the first
+    Bumps the AUTOINCREMENT counter, so ordinary inserts (from any process) never
+    reuse them; ids that end up unused are just gaps.
+    """
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT 'analyses', COALESCE((SELECT MAX(id) FROM analyses), 0)
+            WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'analyses')
+        ''')
+        last = conn.execute(
+            "UPDATE sqlite_sequence SET seq = seq + ? WHERE name = 'analyses' RETURNING seq",
+            (count,)
+        ).fetchone()[0]
+    return last - count + 1
+
+def write_analyses(rows: list):
+    """
+    Insert pre-numbered analysis rows in one transaction, one executemany per table
+    Each row is a dict with "id", "user_id", "analysis_type", "created_at", any other
+    analyses columns and an optional "contour".
+    """
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            f'''INSERT INTO analyses ({', '.join(ANALYSIS_COLUMNS)})
+                VALUES ({', '.join('?' for _ in ANALYSIS_COLUMNS)})''',
+            [tuple(row.get(column) for column in ANALYSIS_COLUMNS) for row in rows]
+        )
+        conn.executemany(
+            _CONTOUR_INSERT,
+            [_contour_values(row["id"], row["contour"]) for row in rows if row.get("contour")]
+        )
+        _update_progress(conn, [{**row, "day": row["created_at"][:10]} for row in rows])
+
+def update_analysis_feedback(analysis_id: int, feedback: str):
+    """Fill in feedback that was generated after the analysis was saved"""
+    conn = get_connection()
+    with conn:
+        conn.execute('UPDATE analyses SET feedback = ? WHERE id = ?', (feedback, analysis_id))
+
+def get_analysis(analysis_id: int, user_id: int):
+    """Get one of the user's analyses"""
+    conn = get_connection()
     cursor = conn.execute('''
-        SELECT id, analysis_type, swara, deviation, stability, 
-               swara_sequence, detected_raga, feedback, created_at
+        SELECT id, swara, deviation, stability, feedback
+        FROM analyses
+        WHERE id = ? AND user_id = ?
+    ''', (analysis_id, user_id))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return {"id": row[0], "swara": row[1], "deviation": row[2], "stability": row[3], "feedback": row[4]}
+
+def get_contour_page(analysis_id: int, user_id: int, offset: int, limit: int):
+    """
+    One page of an analysis's full-resolution contour
+    The stored blob is a few KB even for a 30 s take, so it's decoded whole and sliced.
+    Returns {"hop_seconds", "total", "frame_indices", "cents"} or None if there's none.
+    """
+    conn = get_connection()
+    row = conn.execute('''
+        SELECT c.hop_seconds, c.point_count, c.data
+        FROM analysis_contours c
+        JOIN analyses a ON a.id = c.analysis_id
+        WHERE c.analysis_id = ? AND a.user_id = ?
+    ''', (analysis_id, user_id)).fetchone()
+    if not row:
+        return None
+    hop_seconds, total, data = row
+    frame_indices, cents = decode_contour(data, total)
+    return {
+        "hop_seconds": hop_seconds,
+        "total": total,
+        "frame_indices": frame_indices[offset:offset + limit],
+        "cents": cents[offset:offset + limit]
+    }
+
+HISTORY_SUMMARY_COLUMNS = ["id", "analysis_type", "swara", "deviation", "stability", "detected_raga", "created_at"]
+HISTORY_DETAIL_COLUMNS = ["swara_sequence", "feedback"]
+
+def _encode_history_cursor(created_at, analysis_id) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{analysis_id}".encode()).decode()
+
+def _decode_history_cursor(cursor: str):
+    """(created_at, id) from a cursor, raises ValueError if it's malformed"""
+    try:
+        created_at, analysis_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return created_at, int(analysis_id)
+    except Exception:
+        raise ValueError("Invalid history cursor")
+
+def get_user_history(user_id: int, limit: int = 50, cursor: str = None, include_details: bool = True):
+    """
+    Get one page of the user's analysis history, newest first
+    Keyset pagination on (created_at, id) so deep pages cost the same as the first.
+    Returns (analyses, next_cursor); next_cursor is None on the last page.
+    `include_details=False` leaves out the large text columns (feedback, swara_sequence).
+    """
+    columns = HISTORY_SUMMARY_COLUMNS + (HISTORY_DETAIL_COLUMNS if include_details else [])
+    params = [user_id]
+    after = ""
+    if cursor:
+        params.extend(_decode_history_cursor(cursor))
+        after = "AND (created_at, id) < (?, ?)"
+    params.append(limit + 1)  # one extra row tells us whether there's another page
+    
+    conn = get_connection()
+    rows = conn.execute(f'''
+        SELECT {', '.join(columns)}
         FROM analyses
-        WHERE user_id = ?
-        ORDER BY created_at DESC
+        WHERE user_id = ? {after}
+        ORDER BY created_at DESC, id DESC
         LIMIT ?
-    ''', (user_id, limit))
-    
-    analyses = []
-    for row in cursor.fetchall():
-        analyses.append({
-            "id": row[0],
-            "analysis_type": row[1],
-            "swara": row[2],
-            "deviation": row[3],
-            "stability": row[4],
-            "swara_sequence": row[5],
-            "detected_raga": row[6],
-            "feedback": row[7],
-            "created_at": row[8]
-        })
-    
-    conn.close()
-    return analyses
\ No newline at end of file
+    ''', params).fetchall()
+    
+    analyses = [dict(zip(columns, row)) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = analyses[-1]
+        next_cursor = _encode_history_cursor(last["created_at"], last["id"])
+    
+    return analyses, next_cursor
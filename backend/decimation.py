@@ -0,0 +1,30 @@
+import numpy as np
+
+def minmax_indices(values, max_points: int):
+    """
+    Indices of a shape-preserving subset of `values`, at most `max_points` long
+    The series is cut into (max_points - 2) / 2 equal buckets and each bucket keeps
+    its lowest and highest point, so short excursions survive where evenly spaced
+    picks would step over them. The first and last points are always kept.
+    """
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+
+    n_buckets = (max_points - 2) // 2
+    if n_buckets < 1:
+        # Too few points for any buckets - just keep the ends
+        return np.unique(np.linspace(0, n - 1, max(max_points, 1), dtype=int))
+
+    values = np.asarray(values)
+    inner = np.arange(1, n - 1)
+    bucket = (inner - 1) * n_buckets // (n - 2)
+
+    # Sort by (bucket, value): each bucket's first entry is its min, last its max
+    order = np.lexsort((values[inner], bucket))
+    sorted_bucket = bucket[order]
+    first = np.flatnonzero(np.concatenate([[True], sorted_bucket[1:] != sorted_bucket[:-1]]))
+    last = np.concatenate([first[1:] - 1, [len(order) - 1]])
+
+    picks = inner[np.concatenate([order[first], order[last]])]
+    return np.unique(np.concatenate([[0, n - 1], picks]))
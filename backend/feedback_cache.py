@@ -0,0 +1,48 @@
+import time
+
+from database import get_connection
+from config import FEEDBACK_CACHE_VARIANTS, FEEDBACK_CACHE_TTL, FEEDBACK_CACHE_MAX_ROWS
+
+def feedback_signature(swara: str, skill_level: str, contour_insights) -> str:
+    """
+    Normalized key for everything the Claude prompt depends on
+    Insights come from a fixed set of phrases in a fixed order, so they key as-is
+    """
+    return f"{swara}|{skill_level}|{'; '.join(contour_insights)}"
+
+def get_cached_feedback(signature: str):
+    """
+    A stored feedback text for this signature, or None if we still want a fresh one
+    Only serves from cache once FEEDBACK_CACHE_VARIANTS texts exist, then rotates
+    through them least-recently-served first so students don't see the same words twice.
+    """
+    conn = get_connection()
+    rows = conn.execute('''
+        SELECT id, feedback FROM feedback_cache
+        WHERE signature = ? AND created_at > ?
+        ORDER BY served_at ASC
+    ''', (signature, time.time() - FEEDBACK_CACHE_TTL)).fetchall()
+
+    if len(rows) < FEEDBACK_CACHE_VARIANTS:
+        return None
+
+    variant_id, feedback = rows[0]
+    with conn:
+        conn.execute('UPDATE feedback_cache SET served_at = ? WHERE id = ?', (time.time(), variant_id))
+    return feedback
+
+def store_feedback_variant(signature: str, feedback: str):
+    """Add an LLM-generated text for this signature, evicting expired and overflow rows"""
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            'INSERT INTO feedback_cache (signature, feedback, created_at, served_at) VALUES (?, ?, ?, ?)',
+            (signature, feedback, now, now)
+        )
+        conn.execute('DELETE FROM feedback_cache WHERE created_at <= ?', (now - FEEDBACK_CACHE_TTL,))
+        conn.execute('''
+            DELETE FROM feedback_cache WHERE id IN (
+                SELECT id FROM feedback_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (FEEDBACK_CACHE_MAX_ROWS,))
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from ai_teacher import generate_shruti_feedback_async
+from database import get_analysis, run_db
+from analysis_writer import update_feedback, flush_user_writes
+
+# Finished feedback stays in memory this long for pollers, then comes from the DB
+COMPLETED_TTL = 600  # seconds
+
+_tasks = {}  # analysis_id -> {"user_id", "task", "finished_at"}
+
+def _forget_stale():
+    now = time.time()
+    for analysis_id, entry in list(_tasks.items()):
+        if entry["finished_at"] and now - entry["finished_at"] > COMPLETED_TTL:
+            del _tasks[analysis_id]
+
+def submit_feedback(analysis_id: int, user_id: int, result: dict, on_ready=None):
+    """
+    Generate feedback for a saved analysis in the background
+    The row is updated when it's ready; blocking `on_ready(feedback, source)` then runs on the DB pool.
+    """
+    _forget_stale()
+
+    entry = {"user_id": user_id, "task": None, "finished_at": None}
+
+    async def run():
+        try:
+            feedback, source = await generate_shruti_feedback_async(
+                swara=result['swara'],
+                deviation=result['deviation'],
+                stability=result['overall_stability'],
+                detailed_analysis=result
+            )
+            await run_db(update_feedback, analysis_id, feedback)
+            if on_ready:
+                await run_db(on_ready, feedback, source)
+            return feedback
+        finally:
+            # Failed runs expire too, so _forget_stale can drop them
+            entry["finished_at"] = time.time()
+
+    entry["task"] = asyncio.create_task(run())
+    _tasks[analysis_id] = entry
+
+async def wait_for_feedback(analysis_id: int, user_id: int, timeout: float = None):
+    """
+    Feedback for one of the user's analyses, waiting up to `timeout` seconds if it's still pending
+    Returns {"status": "pending" | "ready", "feedback"} or None if the analysis doesn't exist
+    """
+    entry = _tasks.get(analysis_id)
+    if entry and entry["user_id"] == user_id:
+        task = entry["task"]
+        if not task.done() and timeout:
+            await asyncio.wait({task}, timeout=timeout)
+        if task.done() and not task.exception():
+            return {"status": "ready", "feedback": task.result()}
+        if not task.done():
+            return {"status": "pending", "feedback": None}
+
+    await run_db(flush_user_writes, user_id)
+    row = await run_db(get_analysis, analysis_id, user_id)
+    if row is None:
+        return None
+    if row["feedback"] is None:
+        # Pending work was lost (restart or failure): regenerate from the stored scores
+        submit_feedback(analysis_id, user_id, {
+            "swara": row["swara"], "deviation": row["deviation"], "overall_stability": row["stability"]
+        })
+        return {"status": "pending", "feedback": None}
+    return {"status": "ready", "feedback": row["feedback"]}
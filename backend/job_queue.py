@@ -0,0 +1,122 @@
+import json
+import time
+
+from database import get_connection, insert_analysis
+from config import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETENTION
+
+# queued -> running (leased to one worker) -> done | failed
+# A running job whose lease runs out goes back to whoever claims next.
+
+def enqueue_job(user_id: int, audio_bytes: bytes, params: dict) -> int:
+    """Store an analysis request durably, returns the job id"""
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            '''INSERT INTO analysis_jobs (user_id, status, params, audio, created_at, updated_at)
+               VALUES (?, 'queued', ?, ?, ?, ?)''',
+            (user_id, json.dumps(params), audio_bytes, now, now)
+        )
+    return cursor.lastrowid
+
+def claim_job(worker_id: str, lease_seconds: int = JOB_LEASE_SECONDS):
+    """
+    Lease the oldest claimable job to `worker_id`
+    Claimable = queued, or running with an expired lease (its worker died).
+    One UPDATE ... RETURNING, so two workers can never claim the same job.
+    Returns {"id", "user_id", "params", "audio", "attempts"} or None when idle.
+    """
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        row = conn.execute('''
+            UPDATE analysis_jobs
+            SET status = 'running', lease_owner = ?, lease_expires = ?,
+                attempts = attempts + 1, updated_at = ?
+            WHERE id = (
+                SELECT id FROM analysis_jobs
+                WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?)
+                ORDER BY id LIMIT 1
+            )
+            RETURNING id, user_id, params, audio, attempts
+        ''', (worker_id, now + lease_seconds, now, now)).fetchone()
+    if row is None:
+        return None
+    return {"id": row[0], "user_id": row[1], "params": json.loads(row[2]), "audio": row[3], "attempts": row[4]}
+
+def renew_lease(job_id: int, worker_id: str, lease_seconds: int = JOB_LEASE_SECONDS) -> bool:
+    """Extend a lease we still hold; False if the job was taken over"""
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute('''
+            UPDATE analysis_jobs SET lease_expires = ?, updated_at = ?
+            WHERE id = ? AND lease_owner = ? AND status = 'running'
+        ''', (now + lease_seconds, now, job_id, worker_id))
+    return cursor.rowcount == 1
+
+def complete_job(job_id: int, worker_id: str, user_id: int, analysis: dict, result: dict):
+    """
+    Save the analysis row and mark the job done in one transaction
+    `analysis` is the save_analysis fields (incl. contour); the new analysis_id is
+    added to `result`. Returns the analysis_id, or None if our lease was lost, in
+    which case nothing is written and the new lease holder's run counts instead.
+    """
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        owned = conn.execute('''
+            UPDATE analysis_jobs SET status = 'done', audio = NULL, lease_owner = NULL, updated_at = ?
+            WHERE id = ? AND lease_owner = ? AND status = 'running'
+        ''', (now, job_id, worker_id)).rowcount == 1
+        if not owned:
+            return None
+        analysis_id = insert_analysis(conn, user_id, "single_note", **analysis)
+        conn.execute(
+            'UPDATE analysis_jobs SET result = ?, analysis_id = ? WHERE id = ?',
+            (json.dumps({**result, "analysis_id": analysis_id}), analysis_id, job_id)
+        )
+    return analysis_id
+
+def fail_job(job_id: int, worker_id: str, error: str, retry: bool):
+    """Give a job back to the queue (`retry`, while attempts remain) or mark it failed"""
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            UPDATE analysis_jobs
+            SET status = CASE WHEN ? AND attempts < ? THEN 'queued' ELSE 'failed' END,
+                audio = CASE WHEN ? AND attempts < ? THEN audio ELSE NULL END,
+                error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE id = ? AND lease_owner = ? AND status = 'running'
+        ''', (retry, JOB_MAX_ATTEMPTS, retry, JOB_MAX_ATTEMPTS, error, now, job_id, worker_id))
+
+def get_job(job_id: int, user_id: int):
+    """Status of one of the user's jobs, or None"""
+    conn = get_connection()
+    row = conn.execute('''
+        SELECT status, result, error, analysis_id, attempts, created_at, updated_at
+        FROM analysis_jobs WHERE id = ? AND user_id = ?
+    ''', (job_id, user_id)).fetchone()
+    if row is None:
+        return None
+    status, result, error, analysis_id, attempts, created_at, updated_at = row
+    return {
+        "job_id": job_id,
+        "status": status,
+        "result": json.loads(result) if result else None,
+        "error": error if status == "failed" else None,
+        "analysis_id": analysis_id,
+        "attempts": attempts,
+        "created_at": created_at,
+        "updated_at": updated_at
+    }
+
+def purge_finished_jobs():
+    """Drop done / failed jobs older than JOB_RETENTION"""
+    conn = get_connection()
+    with conn:
+        return conn.execute(
+            "DELETE FROM analysis_jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+            (time.time() - JOB_RETENTION,)
+        ).rowcount
@@ -0,0 +1,164 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+FRAME_SECONDS = 0.064   # ~1024 samples at 16 kHz, same as the batch analysis
+YIN_THRESHOLD = 0.1     # CMNDF dip needed for a frame to count as voiced
+MIN_FRAME_RMS = 1e-3    # quieter frames are treated as silence
+PCM_FORMATS = ("f32", "i16")  # little-endian sample formats decode_pcm accepts
+
+# Distance from Sa: < 10 cents green, < 25 yellow, else red
+COLOR_THRESHOLDS = [10, 25]
+DEVIATION_COLORS = np.array(["green", "yellow", "red"])
+
+# Running-median histogram: 1-cent bins over three octaves either side of Sa
+HIST_MIN_CENTS = -3600
+HIST_MAX_CENTS = 3600
+
+def yin(frames, sr, fmin=65.4, fmax=2093.0, threshold=YIN_THRESHOLD):
+    """
+    Vectorized YIN pitch estimate over a (n_frames, frame_length) array
+    Returns (f0, voiced_flag, voiced_prob) like librosa.pyin, f0 is NaN when unvoiced
+    """
+    n_frames, frame_length = frames.shape
+    if n_frames == 0:
+        return np.empty(0), np.zeros(0, dtype=bool), np.empty(0)
+
+    tau_min = max(int(sr / fmax), 2)
+    tau_max = min(int(sr / fmin), frame_length // 2)
+    window = frame_length - tau_max
+    frames = frames.astype(np.float64, copy=False)
+
+    # Difference function d(tau) = sum (x[j] - x[j+tau])^2, cross term via FFT
+    n_fft = 1 << int(np.ceil(np.log2(frame_length + window)))
+    spectrum = np.fft.rfft(frames, n_fft, axis=1)
+    reference = np.fft.rfft(frames[:, :window], n_fft, axis=1)
+    xcorr = np.fft.irfft(spectrum * np.conj(reference), n_fft, axis=1)[:, :tau_max + 1]
+
+    energy = np.zeros((n_frames, frame_length + 1))
+    np.cumsum(frames ** 2, axis=1, out=energy[:, 1:])
+    taus = np.arange(tau_max + 1)
+    diff = energy[:, window:window + 1] + (energy[:, taus + window] - energy[:, taus]) - 2 * xcorr
+    np.maximum(diff, 0, out=diff)
+
+    # Cumulative mean normalized difference
+    cmndf = np.ones_like(diff)
+    cumulative = np.cumsum(diff[:, 1:], axis=1)
+    cmndf[:, 1:] = diff[:, 1:] * taus[1:] / np.maximum(cumulative, 1e-12)
+
+    # First local minimum below the threshold, else the global minimum (unvoiced)
+    search = cmndf[:, tau_min:tau_max]
+    dips = (search < threshold) & (search <= cmndf[:, tau_min + 1:tau_max + 1])
+    has_dip = dips.any(axis=1)
+    best = np.where(has_dip, dips.argmax(axis=1), search.argmin(axis=1)) + tau_min
+
+    # Parabolic interpolation around the chosen lag
+    rows = np.arange(n_frames)
+    left = cmndf[rows, best - 1]
+    mid = cmndf[rows, best]
+    right = cmndf[rows, np.minimum(best + 1, tau_max)]
+    denom = left - 2 * mid + right
+    safe_denom = np.where(np.abs(denom) > 1e-12, denom, 1.0)
+    shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / safe_denom, 0.0)
+    period = best + np.clip(shift, -1, 1)
+
+    # Gate on the reference window's energy: a silent window matches anything
+    rms = np.sqrt(energy[:, window] / window)
+    voiced_flag = has_dip & (rms > MIN_FRAME_RMS)
+    voiced_prob = np.clip(1 - mid, 0, 1) * voiced_flag
+    f0 = np.where(voiced_flag, sr / period, np.nan)
+    return f0, voiced_flag, voiced_prob
+
+def decode_pcm(data: bytes, sample_format: str = "f32"):
+    """Decode a little-endian mono PCM chunk (float32 or int16) to float32 samples"""
+    if sample_format == "i16":
+        usable = len(data) - len(data) % 2
+        return np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+    usable = len(data) - len(data) % 4
+    return np.frombuffer(data[:usable], dtype="<f4").astype(np.float32)
+
+def deviation_color_codes(cents):
+    """Per-frame index into DEVIATION_COLORS by distance from Sa"""
+    norm = cents % 1200
+    return np.digitize(np.minimum(norm, 1200 - norm), COLOR_THRESHOLDS)
+
+def deviation_colors(cents):
+    """Colour name per frame by distance from Sa"""
+    return DEVIATION_COLORS[deviation_color_codes(cents)]
+
+class LivePitchTracker:
+    """
+    Incremental pitch tracking for one streaming session
+    Each chunk only costs its own frames: leftover samples are carried over and
+    median/std/deviation are updated from running counters, not the whole take.
+    """
+
+    def __init__(self, tonic: float, sr: int = 16000):
+        self.tonic = tonic
+        self.sr = sr
+        self.frame_length = 1 << int(np.ceil(np.log2(sr * FRAME_SECONDS)))
+        self.hop_length = self.frame_length // 4
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._frames_done = 0
+
+        # Running stats
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._histogram = np.zeros(HIST_MAX_CENTS - HIST_MIN_CENTS, dtype=np.int64)
+
+    def process(self, samples) -> dict:
+        """Consume a chunk of samples and return the newly completed frames"""
+        buffer = np.concatenate([self._pending, samples])
+        if len(buffer) < self.frame_length:
+            self._pending = buffer
+            return self._update(np.empty(0), np.empty(0))
+
+        n_frames = 1 + (len(buffer) - self.frame_length) // self.hop_length
+        frames = sliding_window_view(buffer, self.frame_length)[::self.hop_length][:n_frames]
+        self._pending = buffer[n_frames * self.hop_length:]
+
+        f0, voiced_flag, _ = yin(frames, self.sr)
+        frame_index = self._frames_done + np.nonzero(voiced_flag)[0]
+        self._frames_done += n_frames
+
+        cents = 1200 * np.log2(f0[voiced_flag] / self.tonic)
+        times = (frame_index * self.hop_length + self.frame_length / 2) / self.sr
+        return self._update(cents, times)
+
+    def _update(self, cents, times) -> dict:
+        if len(cents):
+            # Chan et al. parallel update of mean / variance
+            chunk_count = len(cents)
+            chunk_mean = float(cents.mean())
+            chunk_m2 = float(((cents - chunk_mean) ** 2).sum())
+            total = self.count + chunk_count
+            delta = chunk_mean - self._mean
+            self._mean += delta * chunk_count / total
+            self._m2 += chunk_m2 + delta ** 2 * self.count * chunk_count / total
+            self.count = total
+
+            bins = np.clip(np.round(cents).astype(np.int64) - HIST_MIN_CENTS, 0, len(self._histogram) - 1)
+            self._histogram += np.bincount(bins, minlength=len(self._histogram))
+
+        return {
+            "type": "pitch",
+            "time_points": np.round(times, 3).tolist(),
+            "pitch_contour": np.round(cents % 1200, 1).tolist(),
+            "deviation_colors": deviation_colors(cents).tolist(),
+            "stats": self.stats()
+        }
+
+    def stats(self) -> dict:
+        """Running median, std and deviation from Sa over everything seen so far"""
+        if self.count == 0:
+            return {"frames": 0, "median": None, "stability": None, "deviation": None}
+
+        cumulative = np.cumsum(self._histogram)
+        median = float(np.searchsorted(cumulative, self.count / 2) + HIST_MIN_CENTS)
+        deviation = ((median % 1200) + 600) % 1200 - 600
+        return {
+            "frames": self.count,
+            "median": round(median, 1),
+            "stability": round(float(np.sqrt(self._m2 / self.count)), 1),
+            "deviation": round(deviation, 1)
+        }
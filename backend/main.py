@@ -1,43 +1,154 @@
 import uvicorn
-import os
-from fastapi import FastAPI, UploadFile, Form, Depends
+import asyncio
+import json
+import time
+import numpy as np
+from typing import List, Optional
+from fastapi import FastAPI, UploadFile, Form, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.formparsers import MultiPartParser
 
 from models import SignupRequest, LoginRequest
-from advanced_analysis import analyze_pitch_detailed
-from ai_teacher import generate_shruti_feedback
-from auth import signup_user, login_user, get_current_user
-from database import init_db, save_analysis, get_user_history
+from advanced_analysis import analyze_pitch_detailed, analyze_swara_sequence, client_result, normalize_cents
+from ai_teacher import generate_shruti_feedback_async, cacheable_feedback
+from auth import (
+    signup_user, login_user, logout_user, get_current_user,
+    authenticate_token, purge_sessions_periodically, security
+)
+from analysis_pool import warm_up, stop_pool, run_analysis, WARM_UP_ATTEMPTS
+from analysis_cache import analysis_cache_key, get_cached_analysis, put_cached_analysis
+from audio_io import read_upload, AudioRejected, UploadLimitMiddleware, UPLOAD_CHUNK_BYTES
+from config import (
+    MAX_UPLOAD_BYTES, PITCH_TRACKER, FEEDBACK_MODE, ANALYSIS_MODE, FEEDBACK_TIMEOUT, BATCH_MAX_FILES, BATCH_MAX_BYTES,
+    CONTOUR_POINTS, CONTOUR_MIN_POINTS, CONTOUR_MAX_POINTS, CONTOUR_PAGE_LIMIT
+)
+from database import init_db, get_user_history, get_contour_page, run_db
+from analysis_writer import queue_analysis, flush_user_writes, stop_writer
+from progress import get_progress
+from feedback_service import submit_feedback, wait_for_feedback
+from job_queue import enqueue_job, get_job
+from batch_analysis import analyze_batch
+from live_pitch import LivePitchTracker, PCM_FORMATS, decode_pcm, deviation_colors
+from pitch_trackers import PITCH_TRACKERS
+from response_encoding import RESPONSE_FORMATS, BINARY_MEDIA_TYPE, compact_result, binary_result
+from compression import CompressionMiddleware
 from raga_data import RAGA_DATABASE
+from raga_index import RAGA_INDEX
+from metrics import REQUEST_SECONDS, render as render_metrics, stage_timer
 
 app = FastAPI(title="Shruti Analyzer API", version="1.0.0")
 
+# Registered before CORS so CORS stays outermost and 413s still carry its headers
+app.add_middleware(UploadLimitMiddleware, default=MAX_UPLOAD_BYTES, limits={"/analyze/batch": BATCH_MAX_BYTES})
+
+# Bodies are capped above, so keep each uploaded file in memory rather than
+# letting Starlette spool anything over 1 MB to a temp file
+MultiPartParser.max_file_size = MAX_UPLOAD_BYTES + UPLOAD_CHUNK_BYTES
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Per-route latency histogram (streaming responses are timed to their first byte)"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template, not the raw path, so /feedback/{analysis_id} is one series
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            endpoint=route.path if route else "unmatched",
+            status=status
+        )
+
+# gzip / brotli by Accept-Encoding, inside CORS so compressed responses keep its headers
+app.add_middleware(CompressionMiddleware)
+
 # Enable CORS for React frontend
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.on_event("startup")
+async def startup():
+    """
+    Create tables, then take traffic right away
+    Analysis workers load librosa and JIT-compile the trackers in the background;
+    /ready reports when that's done.
+    """
+    init_db()
+    app.state.ready = False
+    app.state.warm_up = asyncio.create_task(warm_up_analysis())
+    app.state.session_purger = asyncio.create_task(purge_sessions_periodically())
+
+async def warm_up_analysis():
+    """Background warm-up of the analysis path, flips readiness when done"""
+    start = time.perf_counter()
+    for attempt in range(1, WARM_UP_ATTEMPTS + 1):
+        try:
+            await warm_up()
+            print(f"🔥 Analysis warmed up in {time.perf_counter() - start:.1f}s")
+            break
+        except Exception as e:
+            # Typically a worker killed while loading; drop the broken pool and start a fresh one
+            print(f"⚠️ Analysis warm-up failed (attempt {attempt}/{WARM_UP_ATTEMPTS}): {e!r}")
+            stop_pool()
+    else:
+        print("⚠️ Serving without a warm pool; workers start on the first analysis")
+    app.state.ready = True
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop analysis workers and background tasks, write out queued analyses"""
+    app.state.warm_up.cancel()
+    app.state.session_purger.cancel()
+    stop_pool()
+    stop_writer()
+
 @app.get("/")
 async def root():
-    """Health check endpoint"""
+    """Liveness check - answers as soon as the server is up"""
     return {
         "status": "ok",
         "message": "Shruti Analyzer API is running",
         "version": "1.0.0"
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness check - 503 until the analysis workers are warmed up"""
+    if not app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint: per-stage and per-route latency, queue depth, feedback sources"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.post("/signup")
 async def signup(request: SignupRequest):
     """Register new user"""
-    return signup_user(request.email, request.password, request.name)
+    return await run_db(signup_user, request.email, request.password, request.name)
 
 @app.post("/login")
 async def login(request: LoginRequest):
     """Login existing user"""
-    return login_user(request.email, request.password)
+    return await run_db(login_user, request.email, request.password)
+
+@app.post("/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """End the current session"""
+    return await logout_user(credentials.credentials)
 
 @app.get("/me")
 async def get_me(user: dict = Depends(get_current_user)):
@@ -57,60 +168,348 @@ async def get_ragas():
     return ragas
 
 @app.get("/history")
-async def get_practice_history(user: dict = Depends(get_current_user)):
-    """Get user's practice history"""
-    return get_user_history(user['id'])
+async def get_practice_history(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Get user's practice history, newest first
+    The body stays a plain list; when there are older entries the X-Next-Cursor
+    header holds the `cursor` for the next page. `view=summary` skips feedback text.
+    """
+    await run_db(flush_user_writes, user['id'])
+    try:
+        analyses, next_cursor = await run_db(
+            get_user_history, user['id'], limit, cursor, include_details=(view == "full")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return analyses
+
+@app.get("/history/{analysis_id}/contour")
+async def get_analysis_contour(
+    analysis_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=CONTOUR_PAGE_LIMIT),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Full-resolution pitch contour of one of the user's analyses, one page at a time
+    Same units as the /analyze graph; next_offset is null on the last page.
+    """
+    await run_db(flush_user_writes, user['id'])
+    page = await run_db(get_contour_page, analysis_id, user['id'], offset, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="No contour stored for this analysis")
+    
+    cents = page["cents"]
+    next_offset = offset + len(cents)
+    return {
+        "analysis_id": analysis_id,
+        "total_points": page["total"],
+        "offset": offset,
+        "next_offset": next_offset if next_offset < page["total"] else None,
+        "hop_seconds": page["hop_seconds"],
+        "pitch_contour": np.round(normalize_cents(cents), 1).tolist(),
+        "time_points": np.round(page["frame_indices"] * page["hop_seconds"], 4).tolist(),
+        "deviation_colors": deviation_colors(cents).tolist()
+    }
+
+@app.get("/progress")
+async def get_practice_progress(
+    days: int = Query(30, ge=1, le=365),
+    swara: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Practice progress over the last `days` days: per-swara count, mean / std of
+    deviation and stability, best score, daily buckets and practice streaks
+    Served from running aggregates, so it costs the same after years of practice.
+    """
+    await run_db(flush_user_writes, user['id'])
+    return await run_db(get_progress, user['id'], days, swara)
 
 @app.post("/analyze")
 async def analyze_shruti(
+    request: Request,
     audio: UploadFile, 
     tonic: float = Form(261.63),
+    tracker: str = Form(PITCH_TRACKER),
+    response_format: str = Form("json"),
+    feedback_mode: str = Form(FEEDBACK_MODE),
+    raga: Optional[str] = Form(None),
+    max_points: int = Form(CONTOUR_POINTS),
+    analysis_mode: str = Form(ANALYSIS_MODE),
     user: dict = Depends(get_current_user)
 ):
     """
     Analyze singing and return pitch graph data
     Returns: pitch contour for live visualization + AI feedback
+    `tracker` picks the pitch tracker: "pyin" (accurate) or "yin" (much faster)
+    `response_format` "compact" sends the contour as typed arrays, "binary" (or
+    Accept: application/x-shruti-analysis) a quantized delta-encoded body (see response_encoding)
+    `feedback_mode` "deferred" returns right after pitch analysis with feedback null;
+    fetch it from /feedback/{analysis_id} (poll) or /feedback/{analysis_id}/stream (SSE)
+    `raga` scores the swara-by-swara breakdown against that raga's swaras only
+    `max_points` is the graph's point budget (shape-preserving decimation); every
+    frame is available from /history/{analysis_id}/contour
+    `analysis_mode` "queued" stores the upload as a job for worker.py and returns
+    202 with a job_id right away; poll /jobs/{job_id} for the result
     """
-    temp_path = "temp_recording.wav"
+    if tracker not in PITCH_TRACKERS:
+        raise HTTPException(status_code=400, detail=f"Unknown tracker, choose from {sorted(PITCH_TRACKERS)}")
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown response_format, choose from {list(RESPONSE_FORMATS)}")
+    if feedback_mode not in ("inline", "deferred"):
+        raise HTTPException(status_code=400, detail="Unknown feedback_mode, choose from ['inline', 'deferred']")
+    if raga is not None and raga not in RAGA_DATABASE:
+        raise HTTPException(status_code=400, detail="Unknown raga, see /ragas")
+    if not CONTOUR_MIN_POINTS <= max_points <= CONTOUR_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"max_points must be between {CONTOUR_MIN_POINTS} and {CONTOUR_MAX_POINTS}")
+    if analysis_mode not in ("inline", "queued"):
+        raise HTTPException(status_code=400, detail="Unknown analysis_mode, choose from ['inline', 'queued']")
     
-    # Save uploaded audio
-    with open(temp_path, "wb") as f:
-        f.write(await audio.read())
+    # Decoded from memory in the worker - no shared temp file between requests
+    with stage_timer("upload_read"):
+        audio_bytes = await read_upload(audio)
     
-    try:
+    if analysis_mode == "queued":
+        # Durable from here on - survives restarts and is picked up by any worker.py
+        params = {"tonic": tonic, "tracker": tracker, "raga": raga, "max_points": max_points}
+        job_id = await run_db(enqueue_job, user['id'], audio_bytes, params)
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+        )
+    
+    # Same audio + settings (resubmits, client retries) reuses the earlier result
+    with stage_timer("cache_lookup"):
+        cache_key = analysis_cache_key(audio_bytes, tonic, tracker, raga)
+        cached = await run_db(get_cached_analysis, cache_key)
+    
+    if cached:
+        result, feedback = cached["result"], cached["feedback"]
+    else:
         # Analyze pitch
-        result = analyze_pitch_detailed(temp_path, tonic)
+        try:
+            result = await run_analysis(analyze_pitch_detailed, audio_bytes, tonic, tracker, raga)
+        except AudioRejected as e:
+            raise HTTPException(status_code=413, detail=str(e))
         if not result:
             return {"error": "No voice detected"}
-        
+        feedback = None
+    
+    if feedback is None and feedback_mode == "inline":
         # Generate AI feedback with graph analysis
-        feedback = generate_shruti_feedback(
+        feedback, source = await generate_shruti_feedback_async(
             swara=result['swara'],
             deviation=result['deviation'],
             stability=result['overall_stability'],
             detailed_analysis=result
         )
-        
-        # Save to database
-        save_analysis(
+        await run_db(put_cached_analysis, cache_key, {"result": result, "feedback": cacheable_feedback(feedback, source)})
+    
+    # Save to database
+    with stage_timer("db_save"):
+        analysis_id = await run_db(
+            queue_analysis,
             user_id=user['id'],
             analysis_type="single_note",
             swara=result['swara'],
             deviation=result['deviation'],
             stability=result['overall_stability'],
-            feedback=feedback
+            feedback=feedback,
+            contour=result.get('full_contour')
         )
-        
-        # Return complete result with graph data
-        return {
-            **result,
-            "feedback": feedback
-        }
-        
-    finally:
-        # Cleanup temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    
+    if feedback is None:
+        submit_feedback(
+            analysis_id, user['id'], result,
+            on_ready=lambda text, source: put_cached_analysis(
+                cache_key, {"result": result, "feedback": cacheable_feedback(text, source)}
+            )
+        )
+    
+    # Return complete result with graph data
+    response = {
+        **client_result(result, max_points),
+        "analysis_id": analysis_id,
+        "feedback": feedback,
+        "feedback_status": "ready" if feedback is not None else "pending",
+        "cache": "hit" if cached else "miss"
+    }
+    if response_format == "binary" or BINARY_MEDIA_TYPE in request.headers.get("accept", ""):
+        return Response(binary_result(response, result["full_contour"]["hop_seconds"]), media_type=BINARY_MEDIA_TYPE)
+    if response_format == "compact":
+        return compact_result(response)
+    return response
+
+@app.post("/analyze/batch")
+async def analyze_shruti_batch(
+    audio: List[UploadFile],
+    tonic: float = Form(261.63),
+    tracker: str = Form(PITCH_TRACKER),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Analyze a batch of recordings (e.g. a whole class) in one request
+    Streams NDJSON: one {"type": "result"} line per file in completion order,
+    then {"type": "saved"} with the history ids once everything is stored.
+    """
+    if tracker not in PITCH_TRACKERS:
+        raise HTTPException(status_code=400, detail=f"Unknown tracker, choose from {sorted(PITCH_TRACKERS)}")
+    if len(audio) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Too many files (max {BATCH_MAX_FILES} per batch)")
+    
+    # Read everything now - uploads are closed once the streaming response starts
+    uploads = [(upload.filename, await read_upload(upload)) for upload in audio]
+    if sum(len(audio_bytes) for _, audio_bytes in uploads) > BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch is too large (max {BATCH_MAX_BYTES // (1024 * 1024)} MB)")
+    return StreamingResponse(
+        analyze_batch(uploads, tonic, tracker, user['id']),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/identify-raga")
+async def identify_raga(
+    audio: UploadFile,
+    tonic: float = Form(261.63),
+    tracker: str = Form(PITCH_TRACKER),
+    top_k: int = Form(5),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Identify the raga of a sung phrase
+    Segments the recording into swaras and ranks ragas by swara-set and phrase match
+    """
+    if tracker not in PITCH_TRACKERS:
+        raise HTTPException(status_code=400, detail=f"Unknown tracker, choose from {sorted(PITCH_TRACKERS)}")
+    
+    audio_bytes = await read_upload(audio)
+    try:
+        notes = await run_analysis(analyze_swara_sequence, audio_bytes, tonic, tracker)
+    except AudioRejected as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if not notes:
+        return {"error": "No voice detected"}
+    
+    swara_sequence = [note["swara"] for note in notes]
+    detected_ragas = RAGA_INDEX.match([note["pitch_class"] for note in notes], top_k=max(1, min(top_k, 20)))
+    best = detected_ragas[0]
+    is_valid = not best["extra_swaras"]
+    
+    if is_valid and not best["missing_swaras"]:
+        message = f"Your phrase fits {best['name']} - every swara of the raga was there."
+    elif is_valid:
+        message = f"Your phrase fits {best['name']}; it doesn't use {', '.join(best['missing_swaras'])} yet."
+    else:
+        extra = best["extra_swaras"]
+        message = f"Closest raga is {best['name']}, but {', '.join(extra)} {'is' if len(extra) == 1 else 'are'} not part of it."
+    
+    with stage_timer("db_save"):
+        await run_db(
+            queue_analysis,
+            user_id=user['id'],
+            analysis_type="raga",
+            swara_sequence=" ".join(swara_sequence),
+            detected_raga=best["name"],
+            feedback=message
+        )
+    
+    return {
+        "swara_sequence": swara_sequence,
+        "notes": notes,
+        "detected_ragas": detected_ragas,
+        "raga": best["name"],
+        "is_valid": is_valid,
+        "message": message,
+        "feedback": message
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: int, user: dict = Depends(get_current_user)):
+    """
+    Status of a queued analysis: queued, running, done (with result) or failed (with error)
+    """
+    job = await run_db(get_job, job_id, user['id'])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/feedback/{analysis_id}")
+async def get_feedback(analysis_id: int, wait: float = 0, user: dict = Depends(get_current_user)):
+    """
+    Poll for deferred feedback
+    `wait` > 0 long-polls up to that many seconds (capped at the feedback deadline)
+    """
+    status = await wait_for_feedback(analysis_id, user['id'], timeout=min(wait, FEEDBACK_TIMEOUT))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return {"analysis_id": analysis_id, **status}
+
+@app.get("/feedback/{analysis_id}/stream")
+async def stream_feedback(analysis_id: int, user: dict = Depends(get_current_user)):
+    """Server-sent events: one 'feedback' event as soon as the feedback is ready"""
+    status = await wait_for_feedback(analysis_id, user['id'])
+    if status is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    async def events():
+        current = status
+        # Comment lines keep proxies from closing the idle connection
+        while current["status"] == "pending":
+            yield ": waiting\n\n"
+            current = await wait_for_feedback(analysis_id, user['id'], timeout=5)
+        yield f"event: feedback\ndata: {json.dumps({'analysis_id': analysis_id, **current})}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.websocket("/ws/pitch")
+async def live_pitch_stream(
+    websocket: WebSocket,
+    token: str,
+    tonic: float = 261.63,
+    sample_rate: int = 16000,
+    sample_format: str = "f32"
+):
+    """
+    Live pitch tracking over a WebSocket
+    Client sends mono little-endian PCM chunks (f32 or i16) as binary messages and
+    gets back per-frame cents, deviation colours and running stats for each chunk.
+    Send the text message "stop" to receive a final summary.
+    Browsers can't set headers on WebSockets, so the session token is a query param.
+    """
+    # Also rejects tonic <= 0 / nan / inf, which would turn every update's cents into NaN
+    valid = 8000 <= sample_rate <= 48000 and 0 < tonic < sample_rate / 2 and sample_format in PCM_FORMATS
+    if not valid or not await authenticate_token(token):
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    tracker = LivePitchTracker(tonic, sample_rate)
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            
+            if message.get("bytes"):
+                samples = decode_pcm(message["bytes"], sample_format)
+                # numpy FFTs release the GIL, so a thread keeps the loop free
+                update = await asyncio.to_thread(tracker.process, samples)
+                await websocket.send_json(update)
+            elif message.get("text") == "stop":
+                await websocket.send_json({"type": "summary", **tracker.stats()})
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
 
 if __name__ == "__main__":
     print("🚀 Initializing database...")
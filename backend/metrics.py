@@ -0,0 +1,154 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds: sub-ms cache hits up to pyin on a 30 s clip / slow Claude calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REGISTRY = {}  # metric name -> metric, in registration order
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    record = inc
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    record = observe
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-2] + [series[-1]]):
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, count
+            yield f"{self.name}_sum", labels, series[-2]
+            yield f"{self.name}_count", labels, series[-1]
+
+class Gauge:
+    """Point-in-time value read from `func` at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, func):
+        self.name = name
+        self.help = help
+        self.func = func
+        REGISTRY[name] = self
+
+    def samples(self):
+        yield self.name, {}, self.func()
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+STAGE_SECONDS = Histogram(
+    "shruti_stage_seconds", "Time spent in each stage of the analysis path", ("stage",)
+)
+REQUEST_SECONDS = Histogram(
+    "shruti_request_seconds", "HTTP request latency by route", ("method", "endpoint", "status")
+)
+FEEDBACK_TOTAL = Counter(
+    "shruti_feedback_total",
+    "Feedback responses by source (claude, cache, rule_based = no API key, timeout / fallback = Claude missed its deadline / failed)",
+    ("source",)
+)
+AUDIO_SECONDS = Counter(
+    "shruti_audio_seconds_total", "Seconds of audio analyzed (rate() gives audio seconds processed per second)"
+)
+
+# Worker processes have their own copy of the metrics that nobody scrapes, so while
+# collect_stages is running observations are buffered here and shipped back with the result
+_local = threading.local()
+
+def observe(metric_name: str, value: float, **labels):
+    """Record into a registered metric, or into the active collect_stages buffer"""
+    collected = getattr(_local, "collected", None)
+    if collected is not None:
+        collected.append((metric_name, value, labels))
+    else:
+        REGISTRY[metric_name].record(value, **labels)
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time the enclosed block as one stage in shruti_stage_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(STAGE_SECONDS.name, time.perf_counter() - start, stage=stage)
+
+def collect_stages(func, *args):
+    """Run func(*args) and return (result, buffered observations) - used inside pool workers"""
+    _local.collected = []
+    try:
+        return func(*args), _local.collected
+    finally:
+        _local.collected = None
+
+def record_collected(collected):
+    """Apply observations shipped back from collect_stages in the server process"""
+    for metric_name, value, labels in collected:
+        REGISTRY[metric_name].record(value, **labels)
@@ -28,7 +28,9 @@ class ShrutiAnalysisResult(BaseModel):
     attack_quality: Optional[float] = None
     release_quality: Optional[float] = None
     has_vibrato: Optional[bool] = None
+    vibrato_rate: Optional[float] = None
     vibrato_extent: Optional[float] = None
+    note_duration: Optional[float] = None
     harmonic_clarity: Optional[float] = None
     
     # Visualization data
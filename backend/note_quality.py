@@ -0,0 +1,129 @@
+import numpy as np
+from live_pitch import COLOR_THRESHOLDS
+
+DRIFT_THRESHOLD_CENTS = 20      # total change over the note that counts as drifting
+ATTACK_SECONDS = 0.3            # attack / release windows, at most PHASE_MAX_SHARE of the note each
+PHASE_MAX_SHARE = 0.2
+VIBRATO_BAND_HZ = (4.0, 8.0)    # sung vibrato rates
+VIBRATO_MIN_EXTENT = 8.0        # cents (+/-) before an oscillation counts as vibrato
+VIBRATO_PROMINENCE = 4.0        # band peak vs median spectrum level
+VIBRATO_MIN_SECONDS = 1.0       # need a few cycles to measure a rate
+PROBLEM_ZONE_CENTS = COLOR_THRESHOLDS[1]  # "red" frames
+PROBLEM_ZONE_MIN_SECONDS = 0.15
+
+def _phase_stats(deviation, times, mask, total_span):
+    """Summary of one phase (attack / sustain / release) of the note"""
+    values = deviation[mask]
+    if len(values) == 0:
+        return {"start_time": None, "end_time": None, "duration_pct": 0.0, "mean_deviation": 0.0, "stability": 0.0}
+    start, end = float(times[mask][0]), float(times[mask][-1])
+    return {
+        "start_time": round(start, 3),
+        "end_time": round(end, 3),
+        "duration_pct": round(100 * (end - start) / total_span, 1) if total_span > 0 else 100.0,
+        "mean_deviation": round(float(values.mean()), 1),
+        "stability": round(float(values.std()), 1)
+    }
+
+def _window_quality(deviation, mask):
+    """0-100: how close to Sa the pitch was over a window (100 = dead on)"""
+    values = deviation[mask]
+    if len(values) == 0:
+        return None
+    return int(max(0, 100 - np.abs(values).mean()))
+
+def _vibrato(detrended, hop_seconds):
+    """(rate_hz, extent_cents, prominent) of the strongest oscillation in VIBRATO_BAND_HZ"""
+    n = len(detrended)
+    window = np.hanning(n)
+    # Zero-pad 4x so the peak lands close to its true frequency
+    n_fft = 1 << (int(np.ceil(np.log2(n))) + 2)
+    spectrum = np.abs(np.fft.rfft(detrended * window, n_fft))
+    freqs = np.fft.rfftfreq(n_fft, hop_seconds)
+
+    band = np.flatnonzero((freqs >= VIBRATO_BAND_HZ[0]) & (freqs <= VIBRATO_BAND_HZ[1]))
+    if len(band) == 0:
+        return None, 0.0, False
+    peak = band[np.argmax(spectrum[band])]
+    extent = 2 * spectrum[peak] / window.sum()
+    reference = np.median(spectrum[(freqs >= 1.0) & (freqs <= 1 / (2 * hop_seconds))])
+    return float(freqs[peak]), float(extent), spectrum[peak] >= VIBRATO_PROMINENCE * max(reference, 1e-9)
+
+def _problem_zones(deviation, frame_indices, hop_seconds):
+    """Runs of consecutive off-target frames lasting at least PROBLEM_ZONE_MIN_SECONDS"""
+    off = np.abs(deviation) > PROBLEM_ZONE_CENTS
+    # A run breaks where the flag changes or where unvoiced frames were skipped
+    breaks = (np.diff(off.astype(np.int8)) != 0) | (np.diff(frame_indices) != 1)
+    starts = np.concatenate([[0], np.flatnonzero(breaks) + 1])
+    ends = np.concatenate([starts[1:], [len(off)]])
+    min_frames = max(1, int(round(PROBLEM_ZONE_MIN_SECONDS / hop_seconds)))
+    keep = off[starts] & (ends - starts >= min_frames)
+
+    zones = []
+    for start, end in zip(starts[keep], ends[keep]):
+        mean_dev = float(deviation[start:end].mean())
+        zones.append({
+            "start_time": round(float(frame_indices[start] * hop_seconds), 3),
+            "end_time": round(float(frame_indices[end - 1] * hop_seconds), 3),
+            "mean_deviation": round(mean_dev, 1),
+            "direction": "sharp" if mean_dev > 0 else "flat"
+        })
+    return zones
+
+def note_quality(cents, frame_indices, hop_seconds: float) -> dict:
+    """
+    Note-quality metrics over the full-resolution voiced contour
+    `cents` is pitch relative to Sa for each voiced frame and `frame_indices` their
+    frame numbers. Returns the drift, vibrato, attack/release, phase and
+    problem-zone fields of ShrutiAnalysisResult.
+    """
+    # Distance from the nearest Sa, so an octave jump doesn't read as 1200 cents off
+    deviation = (np.asarray(cents, dtype=np.float64) + 600) % 1200 - 600
+    times = frame_indices * hop_seconds
+    span = float(times[-1] - times[0])
+
+    # Least-squares drift line
+    if len(times) > 1 and span > 0:
+        slope, intercept = np.polyfit(times, deviation, 1)
+    else:
+        slope, intercept = 0.0, float(deviation.mean())
+
+    # Vibrato from the detrended contour on a gap-free frame grid
+    vibrato_rate, vibrato_extent, prominent = None, 0.0, False
+    if span >= VIBRATO_MIN_SECONDS:
+        grid = np.arange(frame_indices[0], frame_indices[-1] + 1)
+        contour = np.interp(grid, frame_indices, deviation)
+        detrended = contour - (intercept + slope * grid * hop_seconds)
+        vibrato_rate, vibrato_extent, prominent = _vibrato(detrended, hop_seconds)
+    has_vibrato = bool(prominent and vibrato_extent >= VIBRATO_MIN_EXTENT)
+
+    # Phases: attack and release windows at either end, sustain in between
+    edge = min(ATTACK_SECONDS, PHASE_MAX_SHARE * span)
+    attack = times <= times[0] + edge
+    release = (times >= times[-1] - edge) & ~attack
+    sustain = ~attack & ~release
+    if not sustain.any():
+        sustain = np.ones(len(times), dtype=bool)
+
+    sustain_phase = _phase_stats(deviation, times, sustain, span)
+    # Wobble is spread around the drift line, so a steady glide doesn't count as wavering
+    sustain_values = deviation[sustain] - (intercept + slope * times[sustain])
+    sustain_phase["wobble_range"] = round(float(np.percentile(sustain_values, 95) - np.percentile(sustain_values, 5)), 1)
+
+    return {
+        "accuracy_percentage": round(100 * float(np.mean(np.abs(deviation) <= PROBLEM_ZONE_CENTS)), 1),
+        "drift_rate": round(float(slope), 2),
+        "is_drifting": bool(abs(slope * span) > DRIFT_THRESHOLD_CENTS),
+        "has_vibrato": has_vibrato,
+        "vibrato_rate": round(vibrato_rate, 1) if has_vibrato else None,
+        "vibrato_extent": round(vibrato_extent, 1),
+        "attack_quality": _window_quality(deviation, attack),
+        "release_quality": _window_quality(deviation, release),
+        "note_duration": round(span, 3),
+        "phases": {
+            "attack": _phase_stats(deviation, times, attack, span),
+            "sustain": sustain_phase,
+            "release": _phase_stats(deviation, times, release, span)
+        },
+        "problem_zones": _problem_zones(deviation, frame_indices, hop_seconds)
+    }
@@ -0,0 +1,148 @@
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from live_pitch import yin, MIN_FRAME_RMS
+from config import (
+    PITCH_TRACKER, DEFAULT_TONIC,
+    SILENCE_TRIM, SILENCE_MARGIN_DB, SILENCE_MAX_DB, SILENCE_MIN_GAP, SILENCE_PADDING
+)
+
+FMIN = 440.0 * 2 ** ((36 - 69) / 12)  # C2 (same as librosa.note_to_hz, without importing librosa)
+FMAX = 440.0 * 2 ** ((96 - 69) / 12)  # C7
+FRAME_LENGTH = 1024  # Smaller frame = faster (was 2048)
+HOP_LENGTH = 256     # Larger hop = fewer frames to process
+
+def track_pyin(y, sr):
+    """Probabilistic YIN with HMM smoothing - most accurate, slowest"""
+    import librosa  # heavy (numba/scipy), only loaded once pyin is actually used
+    return librosa.pyin(
+        y,
+        fmin=FMIN,
+        fmax=FMAX,
+        sr=sr,
+        frame_length=FRAME_LENGTH,
+        hop_length=HOP_LENGTH,
+        fill_na=None        # Don't interpolate missing values
+    )
+
+def track_yin(y, sr):
+    """Vectorized YIN on the same centered frame grid as pyin - no Viterbi pass"""
+    padded = np.pad(y, FRAME_LENGTH // 2)
+    frames = sliding_window_view(padded, FRAME_LENGTH)[::HOP_LENGTH]
+    return yin(frames, sr, fmin=FMIN, fmax=FMAX)
+
+# Every tracker takes (y, sr) and returns (f0, voiced_flag, voiced_probs) per frame
+PITCH_TRACKERS = {
+    "pyin": track_pyin,
+    "yin": track_yin,
+}
+
+def frame_count(n_samples: int) -> int:
+    """Frames the centered trackers produce for a clip of n_samples"""
+    return 1 + n_samples // HOP_LENGTH
+
+def sung_regions(y, sr):
+    """
+    Energy pre-pass: [(start_frame, end_frame)] on the tracker's frame grid worth pitch-tracking
+    Frames within SILENCE_MARGIN_DB of the noise floor (10th percentile frame level) are
+    silence; each region keeps SILENCE_PADDING of context and pauses under
+    SILENCE_MIN_GAP are bridged.
+    """
+    n_frames = frame_count(len(y))
+    # Frame RMS from a running sum of squares over the same centered windows
+    padded = np.pad(y.astype(np.float64), FRAME_LENGTH // 2)
+    energy = np.concatenate([[0.0], np.cumsum(padded ** 2)])
+    starts = np.arange(n_frames) * HOP_LENGTH
+    rms = np.sqrt((energy[starts + FRAME_LENGTH] - energy[starts]) / FRAME_LENGTH)
+
+    # A clip that's sung throughout has a "floor" near the peak, hence the cap
+    noise_floor = np.percentile(rms, 10)
+    threshold = min(noise_floor * 10 ** (SILENCE_MARGIN_DB / 20), rms.max() * 10 ** (SILENCE_MAX_DB / 20))
+    threshold = max(threshold, MIN_FRAME_RMS)
+    loud = rms > threshold
+    if not loud.any():
+        return []
+
+    # Widen every loud frame by the padding, then bridge short pauses
+    pad = int(np.ceil(SILENCE_PADDING * sr / HOP_LENGTH))
+    active = np.convolve(loud, np.ones(2 * pad + 1), mode="same") > 0
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], active.astype(np.int8), [0]])))
+    regions = [[int(start), int(end)] for start, end in zip(edges[::2], edges[1::2])]
+
+    min_gap = int(SILENCE_MIN_GAP * sr / HOP_LENGTH)
+    merged = [regions[0]]
+    for start, end in regions[1:]:
+        if start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(region) for region in merged]
+
+def track_pitch(y, sr, method: str = PITCH_TRACKER, trim: bool = SILENCE_TRIM):
+    """
+    Run the selected pitch tracker
+    With `trim`, only the sung regions are tracked and the results are placed back on
+    the full clip's frame grid (silence = unvoiced), so frame indices and times are exact.
+    """
+    if method not in PITCH_TRACKERS:
+        raise ValueError(f"Unknown pitch tracker '{method}', choose from {sorted(PITCH_TRACKERS)}")
+    tracker = PITCH_TRACKERS[method]
+    if not trim:
+        return tracker(y, sr)
+
+    n_frames = frame_count(len(y))
+    regions = sung_regions(y, sr)
+    if regions == [(0, n_frames)]:
+        return tracker(y, sr)
+
+    f0 = np.full(n_frames, np.nan)
+    voiced_flag = np.zeros(n_frames, dtype=bool)
+    voiced_probs = np.zeros(n_frames)
+    for start, end in regions:
+        # Slice so frame 0 of the segment is centered on sample start * HOP_LENGTH
+        segment = y[start * HOP_LENGTH:(end - 1) * HOP_LENGTH]
+        seg_f0, seg_voiced, seg_probs = tracker(segment, sr)
+        stop = start + len(seg_f0)
+        f0[start:stop] = seg_f0
+        voiced_flag[start:stop] = seg_voiced
+        voiced_probs[start:stop] = seg_probs
+    return f0, voiced_flag, voiced_probs
+
+def compare_to_pyin(y, sr, tonic: float = DEFAULT_TONIC):
+    """
+    Run every tracker on the same clip and report speed and disagreement with pyin
+    Cents differences are over frames both trackers call voiced
+    """
+    timings = {}
+    outputs = {}
+    for name, tracker in PITCH_TRACKERS.items():
+        start = time.perf_counter()
+        outputs[name] = tracker(y, sr)
+        timings[name] = time.perf_counter() - start
+
+    ref_f0, ref_voiced, _ = outputs["pyin"]
+    report = {}
+    for name, (f0, voiced, _) in outputs.items():
+        n = min(len(f0), len(ref_f0))
+        both = ref_voiced[:n] & voiced[:n]
+        cents_diff = 1200 * np.log2(f0[:n][both] / ref_f0[:n][both])
+        report[name] = {
+            "seconds": round(timings[name], 4),
+            "speedup_vs_pyin": round(timings["pyin"] / max(timings[name], 1e-9), 1),
+            "voicing_agreement": round(float(np.mean(voiced[:n] == ref_voiced[:n])), 3) if n else None,
+            "median_abs_cents_diff": round(float(np.median(np.abs(cents_diff))), 2) if len(cents_diff) else None,
+            "p95_abs_cents_diff": round(float(np.percentile(np.abs(cents_diff), 95)), 2) if len(cents_diff) else None,
+            "median_pitch_cents": round(float(np.median(1200 * np.log2(f0[voiced] / tonic))), 1) if voiced.any() else None
+        }
+    return report
+
+if __name__ == "__main__":
+    # python pitch_trackers.py recording.wav [tonic_hz]
+    from audio_io import load_audio
+    audio_y, audio_sr = load_audio(sys.argv[1])
+    clip_tonic = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_TONIC
+    for tracker_name, stats in compare_to_pyin(audio_y, audio_sr, clip_tonic).items():
+        print(f"{tracker_name:6s} {stats}")
@@ -0,0 +1,89 @@
+import math
+from datetime import date, datetime, timedelta, timezone
+
+from database import get_connection
+
+# Reads the progress_daily aggregates that database.py keeps up to date on every
+# insert, so the cost is the number of (swara, day) buckets, not the history size.
+
+def _stats(count: int, mean: float, m2: float) -> dict:
+    return {"mean": round(mean, 1), "std": round(math.sqrt(m2 / count), 1) if count else 0.0}
+
+def _merge(total: dict, bucket: dict):
+    """Combine two running aggregates (Chan et al. parallel variance)"""
+    n_a, n_b = total["count"], bucket["count"]
+    n = n_a + n_b
+    for field in ("deviation", "stability"):
+        delta = bucket[f"{field}_mean"] - total[f"{field}_mean"]
+        total[f"{field}_m2"] += bucket[f"{field}_m2"] + delta * delta * n_a * n_b / n
+        total[f"{field}_mean"] += delta * n_b / n
+    total["count"] = n
+    total["best_score"] = max(total["best_score"], bucket["best_score"])
+
+def _summary(bucket: dict) -> dict:
+    return {
+        "count": bucket["count"],
+        "deviation": _stats(bucket["count"], bucket["deviation_mean"], bucket["deviation_m2"]),
+        "stability": _stats(bucket["count"], bucket["stability_mean"], bucket["stability_m2"]),
+        "best_score": bucket["best_score"]
+    }
+
+def practice_streaks(days: list, today: date):
+    """
+    (current, longest) runs of consecutive practice days from sorted ISO dates
+    The current streak still counts when the last practice was yesterday.
+    """
+    current = longest = run = 0
+    previous = None
+    for day in map(date.fromisoformat, days):
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    if previous is not None and today - previous <= timedelta(days=1):
+        current = run
+    return current, longest
+
+def get_progress(user_id: int, days: int = 30, swara: str = None) -> dict:
+    """
+    Practice summary for the last `days` days (UTC), optionally for one swara
+    Returns per-swara totals for the window, the daily buckets (oldest first) and
+    practice streaks over the user's whole history.
+    """
+    today = datetime.now(timezone.utc).date()
+    since = (today - timedelta(days=days - 1)).isoformat()
+    columns = ["swara", "day", "count", "deviation_mean", "deviation_m2", "stability_mean", "stability_m2", "best_score"]
+    params = [user_id, since]
+    swara_filter = ""
+    if swara is not None:
+        swara_filter = "AND swara = ?"
+        params.append(swara)
+
+    conn = get_connection()
+    buckets = [dict(zip(columns, row)) for row in conn.execute(f'''
+        SELECT {', '.join(columns)}
+        FROM progress_daily
+        WHERE user_id = ? AND day >= ? {swara_filter}
+        ORDER BY day, swara
+    ''', params)]
+    practice_days = [row[0] for row in conn.execute(
+        f'SELECT DISTINCT day FROM progress_daily WHERE user_id = ? {swara_filter} ORDER BY day',
+        [user_id] + params[2:]
+    )]
+
+    totals = {}
+    for bucket in buckets:
+        if bucket["swara"] in totals:
+            _merge(totals[bucket["swara"]], bucket)
+        else:
+            totals[bucket["swara"]] = dict(bucket)
+
+    current_streak, longest_streak = practice_streaks(practice_days, today)
+    return {
+        "days": days,
+        "since": since,
+        "current_streak": current_streak,
+        "longest_streak": longest_streak,
+        "practice_days": len(practice_days),
+        "swaras": {name: _summary(total) for name, total in totals.items()},
+        "daily": [{"day": bucket["day"], "swara": bucket["swara"], **_summary(bucket)} for bucket in buckets]
+    }
@@ -0,0 +1,104 @@
+import numpy as np
+from raga_data import RAGA_DATABASE, ALL_SWARAS
+
+NGRAM_SIZES = (2, 3)
+PAKAD_WEIGHT = 2.0  # characteristic phrases count double
+SET_WEIGHT = 0.5    # share of the score from swara-set overlap (rest from n-grams)
+
+def pitch_class(cents: float) -> int:
+    """Semitone (0-11) above Sa - Ga1/Ga2 etc. share a pitch and can't be told apart by ear"""
+    return int(round(cents / 100)) % 12
+
+SWARA_PITCH_CLASS = {name: pitch_class(cents) for name, cents in ALL_SWARAS.items()}
+
+# Name used when reporting a sung pitch class (first spelling in ALL_SWARAS)
+PITCH_CLASS_NAMES = {}
+for _name, _pc in SWARA_PITCH_CLASS.items():
+    PITCH_CLASS_NAMES.setdefault(_pc, _name)
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(1 << 12)], dtype=np.int32)
+
+def _mask_to_names(mask: int):
+    return [PITCH_CLASS_NAMES[pc] for pc in range(12) if mask >> pc & 1]
+
+class RagaIndex:
+    """
+    Precomputed lookup structure for raga identification
+    Each raga is a 12-bit mask of its pitch classes plus n-gram postings from its
+    aroha, avaroha and pakad. Matching scores every raga's mask in one array op and
+    only touches postings for n-grams that were actually sung, so the cost grows with
+    the query, not with the number of ragas.
+    """
+
+    def __init__(self, ragas: dict):
+        self.names = list(ragas)
+        self.masks = np.zeros(len(self.names), dtype=np.int32)
+        self.ngram_totals = np.zeros(len(self.names))
+        postings = {}
+
+        for raga_id, data in enumerate(ragas.values()):
+            for swara in data["swaras"]:
+                self.masks[raga_id] |= 1 << SWARA_PITCH_CLASS[swara]
+
+            grams = {}
+            phrases = ((data["aroha"], 1.0), (data["avaroha"], 1.0), (data.get("pakad", []), PAKAD_WEIGHT))
+            for phrase, weight in phrases:
+                classes = [SWARA_PITCH_CLASS[swara] for swara in phrase]
+                for gram in _ngrams(classes):
+                    grams[gram] = max(grams.get(gram, 0.0), weight)
+
+            for gram, weight in grams.items():
+                postings.setdefault(gram, []).append((raga_id, weight))
+            self.ngram_totals[raga_id] = sum(grams.values())
+
+        self.postings = {
+            gram: (np.array([raga_id for raga_id, _ in entries]), np.array([weight for _, weight in entries]))
+            for gram, entries in postings.items()
+        }
+
+    def match(self, pitch_classes, top_k: int = 5):
+        """Rank ragas for a sung sequence of pitch classes, best first"""
+        if not pitch_classes:
+            return []
+
+        query_mask = 0
+        for pc in pitch_classes:
+            query_mask |= 1 << pc
+
+        # Swara-set overlap: F1 of "sung notes that belong" and "raga notes that were sung"
+        common = _POPCOUNT[self.masks & query_mask]
+        precision = common / _POPCOUNT[query_mask]
+        recall = common / np.maximum(_POPCOUNT[self.masks], 1)
+        set_score = np.where(common > 0, 2 * precision * recall / np.maximum(precision + recall, 1e-9), 0.0)
+
+        # Phrase evidence: weighted share of each raga's n-grams that appear in the query
+        ngram_hits = np.zeros(len(self.names))
+        for gram in set(_ngrams(pitch_classes)):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                ngram_hits[posting[0]] += posting[1]
+        ngram_score = ngram_hits / np.maximum(self.ngram_totals, 1e-9)
+
+        score = SET_WEIGHT * set_score + (1 - SET_WEIGHT) * ngram_score
+        top_k = min(top_k, len(self.names))
+        best = np.argpartition(-score, top_k - 1)[:top_k]
+        best = best[np.argsort(-score[best])]
+
+        return [
+            {
+                "name": self.names[raga_id],
+                "score": round(float(score[raga_id]), 3),
+                "set_score": round(float(set_score[raga_id]), 3),
+                "ngram_score": round(float(ngram_score[raga_id]), 3),
+                "missing_swaras": _mask_to_names(int(self.masks[raga_id]) & ~query_mask),
+                "extra_swaras": _mask_to_names(query_mask & ~int(self.masks[raga_id]))
+            }
+            for raga_id in best
+        ]
+
+def _ngrams(classes):
+    for n in NGRAM_SIZES:
+        for start in range(len(classes) - n + 1):
+            yield tuple(classes[start:start + n])
+
+RAGA_INDEX = RagaIndex(RAGA_DATABASE)
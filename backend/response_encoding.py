@@ -0,0 +1,73 @@
+import base64
+import json
+import struct
+
+import numpy as np
+from live_pitch import COLOR_THRESHOLDS, DEVIATION_COLORS
+
+RESPONSE_FORMATS = ("json", "compact", "binary")
+BINARY_MEDIA_TYPE = "application/x-shruti-analysis"
+BINARY_MAGIC = b"SHRU"
+BINARY_VERSION = 1
+CONTOUR_SCALE = 0.1  # cents per quantization step (the JSON contour is rounded to 0.1 too)
+
+# Per-point arrays in an analysis result and how they're packed in compact form
+_COLOR_CODES = {name: code for code, name in enumerate(DEVIATION_COLORS.tolist())}
+
+def _pack(values, dtype) -> str:
+    """Base64 of a little-endian typed array (decode with Float32Array / Uint8Array)"""
+    return base64.b64encode(np.asarray(values, dtype=dtype).tobytes()).decode("ascii")
+
+def compact_result(result: dict) -> dict:
+    """
+    Compact form of an analysis result for bandwidth-sensitive clients
+    Contour and times become base64 float32 arrays, colours become uint8 codes
+    and the all-zero target line is dropped.
+    """
+    compact = {
+        key: value for key, value in result.items()
+        if key not in ("pitch_contour", "time_points", "target_line", "deviation_colors")
+    }
+    compact["contour"] = {
+        "length": len(result["pitch_contour"]),
+        "pitch_contour": _pack(result["pitch_contour"], "<f4"),
+        "time_points": _pack(result["time_points"], "<f4"),
+        "deviation_codes": _pack([_COLOR_CODES[c] for c in result["deviation_colors"]], "u1"),
+        "color_legend": DEVIATION_COLORS.tolist(),
+        "color_thresholds": COLOR_THRESHOLDS
+    }
+    return compact
+
+def binary_result(result: dict, hop_seconds: float) -> bytes:
+    """
+    Binary form of an analysis result (BINARY_MEDIA_TYPE), little-endian:
+        4s magic "SHRU" | u8 version | u32 metadata length | metadata (UTF-8 JSON)
+        i16[length] contour in CONTOUR_SCALE steps, delta-encoded (first value absolute)
+        u16[length] frame steps, time[i] = start_time + time_step * cumsum(steps)[i]
+    Metadata is every scalar / nested field of the JSON result plus a "contour"
+    descriptor. Colours follow from the contour and color_thresholds, the target
+    line is always zero and gauge_value equals deviation, so none of them are sent.
+    """
+    metadata = {
+        key: value for key, value in result.items()
+        if key not in ("pitch_contour", "time_points", "target_line", "deviation_colors", "gauge_value")
+    }
+    quantized = np.round(np.asarray(result["pitch_contour"], dtype=np.float64) / CONTOUR_SCALE).astype(np.int32)
+    frames = np.round(np.asarray(result["time_points"], dtype=np.float64) / hop_seconds).astype(np.int64)
+    start_time = float(frames[0] * hop_seconds) if len(frames) else 0.0
+
+    metadata["contour"] = {
+        "length": len(quantized),
+        "start_time": round(start_time, 4),
+        "time_step": hop_seconds,
+        "value_scale": CONTOUR_SCALE,
+        "color_legend": DEVIATION_COLORS.tolist(),
+        "color_thresholds": COLOR_THRESHOLDS
+    }
+    header = json.dumps(metadata, separators=(",", ":")).encode()
+    return b"".join([
+        struct.pack("<4sBI", BINARY_MAGIC, BINARY_VERSION, len(header)),
+        header,
+        np.diff(quantized, prepend=0).astype("<i2").tobytes(),
+        np.diff(frames, prepend=frames[:1]).astype("<u2").tobytes()
+    ])
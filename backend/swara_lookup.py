@@ -0,0 +1,65 @@
+import numpy as np
+from raga_data import RAGA_DATABASE, ALL_SWARAS
+
+class SwaraLookup:
+    """
+    Nearest swara for every whole cent 0-1199 above Sa, precomputed
+    Labelling a contour is then one array index instead of a search per frame.
+    """
+
+    def __init__(self, swaras: dict):
+        self.names = np.array(list(swaras.keys()))
+        self.cents = np.array(list(swaras.values()), dtype=float)
+
+        grid = np.arange(1200, dtype=float)
+        # Signed wrap-around distance from every cent to every swara
+        offsets = (grid[:, None] - self.cents[None, :] + 600) % 1200 - 600
+        self.nearest = np.argmin(np.abs(offsets), axis=1).astype(np.int16)
+        self.offset = offsets[np.arange(1200), self.nearest]
+
+    def label(self, cents):
+        """
+        Per-frame (swara index into self.names, signed cents from that swara)
+        `cents` is relative to Sa in any octave; the sub-cent part is carried over exactly
+        """
+        norm = np.asarray(cents, dtype=float) % 1200
+        quantized = np.rint(norm)
+        table_index = quantized.astype(np.int64) % 1200
+        return self.nearest[table_index], self.offset[table_index] + (norm - quantized)
+
+ALL_SWARAS_LOOKUP = SwaraLookup(ALL_SWARAS)
+RAGA_SWARA_LOOKUPS = {name: SwaraLookup(data["swaras"]) for name, data in RAGA_DATABASE.items()}
+
+def get_swara_lookup(raga: str = None) -> SwaraLookup:
+    """Lookup table for a raga's swaras, or for all swaras when no raga is given"""
+    if raga is None:
+        return ALL_SWARAS_LOOKUP
+    return RAGA_SWARA_LOOKUPS[raga]
+
+def swara_breakdown(cents, raga: str = None):
+    """
+    Swara-by-swara scoring of a full-resolution contour
+    Every frame is labelled with its nearest swara (of the raga, if given) and the
+    per-swara counts and deviations are summed with bincount - no loop over frames.
+    """
+    lookup = get_swara_lookup(raga)
+    labels, offsets = lookup.label(cents)
+    n_swaras = len(lookup.names)
+    frames = np.bincount(labels, minlength=n_swaras)
+    offset_sum = np.bincount(labels, weights=offsets, minlength=n_swaras)
+    abs_sum = np.bincount(labels, weights=np.abs(offsets), minlength=n_swaras)
+
+    breakdown = []
+    for i in np.argsort(-frames):
+        if frames[i] == 0:
+            break
+        mean_abs = abs_sum[i] / frames[i]
+        breakdown.append({
+            "swara": str(lookup.names[i]),
+            "frames": int(frames[i]),
+            "share": round(float(frames[i] / len(labels)), 3),
+            "mean_deviation": round(float(offset_sum[i] / frames[i]), 1),
+            "mean_abs_deviation": round(float(mean_abs), 1),
+            "score": int(max(0, 100 - mean_abs))
+        })
+    return breakdown
@@ -0,0 +1,89 @@
+import numpy as np
+from audio_io import ANALYSIS_SAMPLE_RATE
+from pitch_trackers import HOP_LENGTH
+
+HOP_SECONDS = HOP_LENGTH / ANALYSIS_SAMPLE_RATE  # ground truth is reported on the analysis frame grid
+
+def synth_voice(
+    tonic: float = 261.63,
+    cents_offset: float = 0.0,
+    duration: float = 3.0,
+    sr: int = ANALYSIS_SAMPLE_RATE,
+    drift_cents: float = 0.0,
+    vibrato_rate: float = 0.0,
+    vibrato_extent: float = 0.0,
+    wobble_cents: float = 0.0,
+    lead_silence: float = 0.0,
+    trail_silence: float = 0.0,
+    gaps=(),
+    noise: float = 0.005,
+    seed: int = 0
+):
+    """
+    Sung-note-like test signal with known pitch at every instant
+    Pitch (cents above `tonic`) = cents_offset + linear drift over the note
+    + sinusoidal vibrato (rate Hz, +/- extent cents) + slow random wobble.
+    `gaps` are (start, length) seconds of silence inside the note.
+    Returns (y, sr, truth) with truth["cents"] per analysis frame (NaN when silent).
+    """
+    rng = np.random.default_rng(seed)
+    n_note = int(duration * sr)
+    t = np.arange(n_note) / sr
+
+    cents = cents_offset + drift_cents * t / max(duration, 1e-9)
+    if vibrato_extent:
+        cents = cents + vibrato_extent * np.sin(2 * np.pi * vibrato_rate * t)
+    if wobble_cents:
+        # Smoothed random walk, ~3 Hz bandwidth, scaled to +/- wobble_cents
+        walk = np.cumsum(rng.standard_normal(n_note))
+        kernel = np.hanning(int(sr / 3))
+        walk = np.convolve(walk - walk.mean(), kernel / kernel.sum(), mode="same")
+        cents = cents + wobble_cents * walk / max(np.abs(walk).max(), 1e-9)
+
+    freq = tonic * 2 ** (cents / 1200)
+    phase = 2 * np.pi * np.cumsum(freq) / sr
+    # A few harmonics so it looks like a voice to the trackers, with a soft attack/release
+    note = 0.3 * np.sin(phase) + 0.15 * np.sin(2 * phase) + 0.07 * np.sin(3 * phase)
+    envelope = np.minimum(1.0, np.minimum(t, duration - t) / 0.05)
+    note *= envelope
+
+    voiced = np.ones(n_note, dtype=bool)
+    for gap_start, gap_length in gaps:
+        gap = (t >= gap_start) & (t < gap_start + gap_length)
+        note[gap] = 0.0
+        voiced[gap] = False
+
+    lead = np.zeros(int(lead_silence * sr))
+    trail = np.zeros(int(trail_silence * sr))
+    y = np.concatenate([lead, note, trail])
+    y = (y + noise * rng.standard_normal(len(y))).astype(np.float32)
+
+    # Ground truth on the analysis frame grid
+    frame_times = np.arange(int(len(y) / sr / HOP_SECONDS) + 1) * HOP_SECONDS
+    note_times = frame_times - lead_silence
+    inside = (note_times >= 0) & (note_times < duration)
+    sample_index = np.clip((note_times * sr).astype(int), 0, n_note - 1)
+    truth_cents = np.where(inside & voiced[sample_index], cents[sample_index], np.nan)
+
+    truth = {
+        "cents": truth_cents,
+        "frame_times": frame_times,
+        "median_cents": float(np.nanmedian(truth_cents)),
+        "std_cents": float(np.nanstd(truth_cents)),
+        "voiced_seconds": float(voiced.sum() / sr),
+        "vibrato": bool(vibrato_rate > 0 and vibrato_extent > 0),
+        "wavering": bool(wobble_cents > 0 or (vibrato_rate > 0 and vibrato_extent > 0)),
+        "duration": len(y) / sr
+    }
+    return y, sr, truth
+
+# Named scenarios used by benchmark.py
+SCENARIOS = {
+    "steady": dict(cents_offset=5, duration=3),
+    "drift": dict(cents_offset=0, drift_cents=-40, duration=4),
+    "vibrato": dict(cents_offset=10, vibrato_rate=5.5, vibrato_extent=30, duration=4),
+    "wobble": dict(cents_offset=-15, wobble_cents=25, duration=4),
+    "silence_gaps": dict(cents_offset=20, duration=4, lead_silence=1.5, trail_silence=1.5, gaps=[(1.5, 0.6)]),
+    "short": dict(cents_offset=8, duration=1),
+    "long": dict(cents_offset=-8, vibrato_rate=5, vibrato_extent=15, duration=25),
+}
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Small in-process LRU where every entry also expires after a TTL
+    Thread-safe: the caches are shared by the DB thread pool.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, stored_at=None, ttl=None):
+        """Store a value; `ttl` can shorten (never extend) the cache-wide TTL for this entry"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = ((stored_at or time.time()) + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose value matches `predicate(value)`"""
+        with self._lock:
+            for key, (_, value) in list(self._entries.items()):
+                if predicate(value):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
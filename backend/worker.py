@@ -0,0 +1,143 @@
+"""
+Analysis worker for the durable job queue
+
+    python worker.py            # run until SIGTERM / Ctrl-C
+    python worker.py --once     # drain the queue, then exit
+
+Claims jobs that /analyze queued (analysis_mode=queued) from the analysis_jobs
+table, runs pitch analysis + feedback and saves the result. Start as many as the
+CPU allows, separately from the web process; a worker that dies mid-job stops
+renewing its lease and the job is picked up again by another.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+
+from advanced_analysis import analyze_pitch_detailed, client_result, warm_up_pipeline
+from ai_teacher import generate_shruti_feedback, cacheable_feedback
+from analysis_cache import analysis_cache_key, get_cached_analysis, put_cached_analysis
+from audio_io import AudioRejected
+from database import init_db
+from job_queue import claim_job, renew_lease, complete_job, fail_job, purge_finished_jobs
+from config import JOB_LEASE_SECONDS, JOB_POLL_INTERVAL, JOB_MAX_ATTEMPTS
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+PURGE_INTERVAL = 3600  # seconds between clean-ups of old finished jobs
+
+_stopping = threading.Event()
+
+class LeaseKeeper:
+    """Renews a job's lease in the background while it's being worked on"""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.lost = False
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._done.wait(JOB_LEASE_SECONDS / 3):
+            if not renew_lease(self.job_id, WORKER_ID):
+                self.lost = True
+                print(f"⚠️ Lost the lease on job {self.job_id}")
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+
+def process_job(job: dict):
+    """Analyze one claimed job and store its result"""
+    params = job["params"]
+    audio = job["audio"]
+    cache_key = analysis_cache_key(audio, params["tonic"], params["tracker"], params.get("raga"))
+    cached = get_cached_analysis(cache_key)
+
+    if cached:
+        result, feedback = cached["result"], cached["feedback"]
+    else:
+        result = analyze_pitch_detailed(audio, params["tonic"], params["tracker"], params.get("raga"))
+        if not result:
+            fail_job(job["id"], WORKER_ID, "No voice detected", retry=False)
+            return
+        feedback = None
+
+    if feedback is None:
+        feedback, source = generate_shruti_feedback(
+            swara=result['swara'],
+            deviation=result['deviation'],
+            stability=result['overall_stability'],
+            detailed_analysis=result
+        )
+        put_cached_analysis(cache_key, {"result": result, "feedback": cacheable_feedback(feedback, source)})
+
+    analysis = {
+        "swara": result['swara'],
+        "deviation": result['deviation'],
+        "stability": result['overall_stability'],
+        "feedback": feedback,
+        "contour": result.get('full_contour')
+    }
+    response = {
+        **client_result(result, params["max_points"]),
+        "feedback": feedback,
+        "feedback_status": "ready",
+        "cache": "hit" if cached else "miss"
+    }
+    if complete_job(job["id"], WORKER_ID, job["user_id"], analysis, response) is None:
+        print(f"⚠️ Job {job['id']} was taken over by another worker, result discarded")
+
+def run_worker(once: bool = False):
+    """Claim and process jobs until stopped (or until the queue is empty with `once`)"""
+    init_db()
+    print(f"🔥 Worker {WORKER_ID} warming up...")
+    warm_up_pipeline()
+    print(f"👷 Worker {WORKER_ID} waiting for jobs")
+
+    last_purge = 0.0
+    while not _stopping.is_set():
+        if time.time() - last_purge > PURGE_INTERVAL:
+            purge_finished_jobs()
+            last_purge = time.time()
+
+        job = claim_job(WORKER_ID)
+        if job is None:
+            if once:
+                return
+            _stopping.wait(JOB_POLL_INTERVAL)
+            continue
+
+        if job["attempts"] > JOB_MAX_ATTEMPTS:
+            # Claimed again after its workers kept dying - don't let it take down more
+            fail_job(job["id"], WORKER_ID, "Analysis failed repeatedly", retry=False)
+            continue
+
+        start = time.perf_counter()
+        with LeaseKeeper(job["id"]):
+            try:
+                process_job(job)
+            except AudioRejected as e:
+                fail_job(job["id"], WORKER_ID, str(e), retry=False)
+            except Exception as e:
+                print(f"Job {job['id']} error: {e}")
+                fail_job(job["id"], WORKER_ID, "Analysis failed", retry=True)
+        print(f"✅ Job {job['id']} finished in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    # Finish the current job on SIGTERM (e.g. a deploy), then exit
+    signal.signal(signal.SIGTERM, lambda *_: _stopping.set())
+    try:
+        run_worker(once=args.once)
+    except KeyboardInterrupt:
+        pass
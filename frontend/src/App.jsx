@@ -50,7 +50,7 @@ function App() {
 
   const fetchHistory = async () => {
     try {
-      const res = await fetch(`${API_URL}/history`, {
+      const res = await fetch(`${API_URL}/history?limit=5`, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (res.ok) {
@@ -2,12 +2,16 @@ function MetricsDashboard({ data }) {
   if (!data) return null;
 
   const getScoreColor = (score) => {
+    if (score == null) return '#95a5a6';
     if (score >= 80) return '#27ae60';
     if (score >= 60) return '#f39c12';
     if (score >= 40) return '#e67e22';
     return '#e74c3c';
   };
 
+  // Attack / release are null when the note is too short to have that window
+  const formatScore = (score) => (score == null ? '—' : `${score}/100`);
+
   const metrics = [
     {
       label: 'Overall Accuracy',
@@ -17,7 +21,7 @@ function MetricsDashboard({ data }) {
     },
     {
       label: 'Attack Quality',
-      value: `${data.attack_quality}/100`,
+      value: formatScore(data.attack_quality),
       color: getScoreColor(data.attack_quality),
       icon: '⚡'
     },
@@ -29,7 +33,7 @@ function MetricsDashboard({ data }) {
     },
     {
       label: 'Release Quality',
-      value: `${data.release_quality}/100`,
+      value: formatScore(data.release_quality),
       color: getScoreColor(data.release_quality),
       icon: '🎵'
     }